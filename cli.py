@@ -0,0 +1,450 @@
+"""
+奶酪云工具箱 - 命令行入口
+Cheese Cloud Tools - Command Line
+
+不加载 Qt，可在无界面的服务器上批量处理图片：
+    python cli.py compress photos/*.jpg -o out --mode balanced -j 8
+    python cli.py convert "src/**/*.png" -o out --format webp
+    python cli.py watermark shots/ -o out --text "© Cheese" --position bottom-right
+    python cli.py convert scans/ -o out --format pdf --combine invoices.pdf --page-size a4
+    python cli.py convert assets/ -o out --format webp --incremental
+    python cli.py similar "photos/**/*.jpg" --distance 6
+
+进度以 JSON Lines 输出到标准输出，每行一个事件（skip / start / file / group / done）。
+退出码: 0 全部成功, 1 部分文件失败, 2 参数错误或没有可处理的文件, 130 被中断
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from functools import partial
+from pathlib import Path
+
+# 添加项目根目录到路径
+PROJECT_ROOT = Path(__file__).parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.config import config
+from tools.image.compressor import SmartCompressor, compress_file
+from tools.image.converter import TARGET_FORMATS, convert_file
+from tools.image.watermarker import POSITIONS, watermark_file
+from tools.image.manifest import Manifest
+from tools.image.pdf_writer import PAGE_SIZES, FIT_MODES, assemble_pdf
+from tools.image.parallel import run_in_pool, default_workers, resolve_memory_budget
+from tools.image.result_cache import ResultCache, get_cache_dir
+from tools.image.similar import DEFAULT_MAX_DISTANCE, find_similar
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+COMPRESS_MODES = (
+    SmartCompressor.MODE_VISUALLY_LOSSLESS,
+    SmartCompressor.MODE_BALANCED,
+    SmartCompressor.MODE_MAXIMUM,
+    SmartCompressor.MODE_LOSSLESS,
+    SmartCompressor.MODE_TARGET_SIZE,
+)
+
+
+def expand_inputs(patterns: list) -> list:
+    """展开文件 / 目录 / 通配符，去重并保持顺序"""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(
+                str(p) for p in Path(pattern).iterdir()
+                if p.suffix.lower() in IMAGE_EXTS
+            )
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            # 明确指定的文件即使不存在也保留，交给任务报告失败
+            matches = [pattern]
+        
+        for path in matches:
+            if os.path.isdir(path):
+                continue
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                files.append(path)
+    return files
+
+
+def emit(event: str, **fields):
+    """输出一行 JSON 进度事件（省略值为 None 的字段）"""
+    fields = {"event": event, **{k: v for k, v in fields.items() if v is not None}}
+    sys.stdout.write(json.dumps(fields, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def write_output(result: dict, output_dir: str) -> dict:
+    """把结果数据写入输出目录，返回不含数据的结果（避免跨进程传递大块数据）"""
+    data = result.pop("data", None)
+    if result.get("success") and data is not None:
+        output_path = os.path.join(output_dir, result["output_name"])
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        result["output"] = output_path
+        result["size"] = len(data)
+    return result
+
+
+def compress_task(file_path: str, settings: dict, output_dir: str, cache_dir: str = None) -> dict:
+    """压缩任务（进程池中执行）"""
+    start = time.perf_counter()
+    result = write_output(compress_file(file_path, settings, cache_dir), output_dir)
+    # 只有压缩使用结果缓存，cached 字段只出现在压缩事件中
+    result.setdefault("cached", False)
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def convert_task(file_path: str, target_format: str, output_dir: str) -> dict:
+    """格式转换任务（进程池中执行）"""
+    start = time.perf_counter()
+    result = write_output(convert_file(file_path, target_format), output_dir)
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def watermark_task(file_path: str, watermark_config: dict, output_dir: str,
+                   budget_mp: float = None) -> dict:
+    """水印任务（进程池中执行）"""
+    start = time.perf_counter()
+    result = write_output(
+        watermark_file(file_path, watermark_config, budget_mp=budget_mp), output_dir
+    )
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(task, files: list, jobs: int, memory_budget: int = None,
+              on_success=None) -> int:
+    """
+    执行批处理并输出进度
+    
+    Args:
+        memory_budget: 并行时在途任务的内存预算（字节）
+        on_success: 每个文件成功后调用 on_success(file_path, result)
+    
+    Returns:
+        失败的文件数
+    """
+    total = len(files)
+    start = time.perf_counter()
+    emit("start", total=total, jobs=jobs)
+    
+    if jobs > 1 and total > 1:
+        outcomes = run_in_pool(task, files, jobs, memory_budget=memory_budget)
+    else:
+        outcomes = _run_serial(task, files)
+    
+    done = 0
+    failed = 0
+    for file_path, result, error in outcomes:
+        done += 1
+        if error is not None or not result.get("success"):
+            failed += 1
+            message = str(error) if error is not None else result.get("error", "")
+            logging.error(f"处理失败 {file_path}: {message}")
+            emit("file", index=done, total=total, file=file_path,
+                 success=False, error=message)
+        else:
+            if on_success:
+                on_success(file_path, result)
+            emit("file", index=done, total=total, file=file_path, success=True,
+                 output=result.get("output"), size=result.get("size"),
+                 original_size=result.get("original_size"),
+                 quality=result.get("quality"), ssim=result.get("ssim"),
+                 colors=result.get("colors"), encode_time=result.get("encode_time"),
+                 format=result.get("format"),
+                 cached=result.get("cached"), elapsed=result.get("elapsed"))
+    
+    emit("done", total=total, success=total - failed, failed=failed,
+         elapsed=round(time.perf_counter() - start, 3))
+    return failed
+
+
+def _run_serial(task, files: list):
+    for file_path in files:
+        try:
+            yield file_path, task(file_path), None
+        except Exception as e:
+            yield file_path, None, e
+
+
+def run_similar(files: list, max_distance: int, jobs: int):
+    """输出相似图片分组，每组第一张为建议保留的图片"""
+    start = time.perf_counter()
+    emit("start", total=len(files), jobs=jobs)
+    groups = find_similar(files, max_distance, jobs)
+    for index, group in enumerate(groups, 1):
+        emit("group", index=index, files=[
+            {"file": path, "width": size[0], "height": size[1]} for path, size in group
+        ])
+    emit("done", total=len(files), groups=len(groups),
+         similar=sum(len(g) for g in groups),
+         elapsed=round(time.perf_counter() - start, 3))
+
+
+def run_combine(files: list, output_path: str, page_size: str, fit: str) -> int:
+    """
+    按输入顺序把所有图片合并为一个 PDF（逐页写入）
+    
+    Returns:
+        失败的文件数
+    """
+    total = len(files)
+    start = time.perf_counter()
+    emit("start", total=total, jobs=1)
+    failed = 0
+    for index, (file_path, error) in enumerate(
+            assemble_pdf(files, output_path, page_size, fit), 1):
+        if error is not None:
+            failed += 1
+            emit("file", index=index, total=total, file=file_path,
+                 success=False, error=str(error))
+        else:
+            emit("file", index=index, total=total, file=file_path, success=True)
+    emit("done", total=total, success=total - failed, failed=failed,
+         output=output_path if failed < total else None,
+         elapsed=round(time.perf_counter() - start, 3))
+    return failed
+
+
+def parse_color(value: str) -> tuple:
+    """解析 #RRGGBB 颜色"""
+    value = value.lstrip('#')
+    if len(value) != 6:
+        raise argparse.ArgumentTypeError(f"颜色格式应为 #RRGGBB: {value}")
+    try:
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"颜色格式应为 #RRGGBB: {value}")
+
+
+def parse_bounds(value: str) -> tuple:
+    """解析 宽x高 尺寸上限"""
+    try:
+        width, height = (int(v) for v in value.lower().replace('×', 'x').split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"尺寸格式应为 宽x高: {value}")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"尺寸必须为正数: {value}")
+    return width, height
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="奶酪云工具箱 - 图片批处理（无界面）"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出详细日志到标准错误")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    def add_common(sub):
+        sub.add_argument("inputs", nargs="+", help="图片文件、目录或通配符（支持 **）")
+        sub.add_argument("-o", "--output", required=True, help="输出目录")
+        sub.add_argument("-j", "--jobs", type=int, default=default_workers(),
+                         help="并行进程数，默认CPU核心数")
+        sub.add_argument("--memory-mb", type=int,
+                         help="并行处理的内存预算 (MB)，大图会单独运行，默认读取配置")
+        sub.add_argument("--budget-mp", type=float,
+                         help="大图像素预算（百万像素），超过时走有界内存路径，默认读取配置")
+    
+    compress = subparsers.add_parser("compress", help="压缩图片（保持原格式）")
+    add_common(compress)
+    compress.add_argument("--mode", choices=COMPRESS_MODES,
+                          default=SmartCompressor.MODE_VISUALLY_LOSSLESS, help="压缩模式")
+    compress.add_argument("--quality", type=int, help="手动指定质量 (1-100)")
+    compress.add_argument("--resize", type=int, default=100, help="缩放百分比")
+    bounds = compress.add_mutually_exclusive_group()
+    bounds.add_argument("--fit", type=parse_bounds, metavar="WxH",
+                        help="等比缩小到该尺寸以内，如 1920x1080（不放大）")
+    bounds.add_argument("--long-edge", type=int, metavar="N",
+                        help="等比缩小到长边不超过 N 像素（不放大）")
+    compress.add_argument("--target-size", type=int, help="目标大小 (KB)，用于 target 模式")
+    compress.add_argument("--ssim", type=float, help="视觉无损模式的 SSIM 阈值")
+    compress.add_argument("--png-colors", type=int, help="PNG 有损量化的颜色数 (2-256)，不指定时保持无损")
+    compress.add_argument("--no-dither", action="store_true", help="PNG 量化时不使用抖动")
+    compress.add_argument("--png-exhaustive", action="store_true",
+                          help="PNG 穷举滤波 / zlib 策略（调色板图片另加调色板重排），较慢")
+    compress.add_argument("--effort", choices=tuple(SmartCompressor.EFFORT_PRESETS),
+                          default=SmartCompressor.EFFORT_MAX,
+                          help="编码力度：fast 最快 / default 标准 / max 体积最小")
+    compress.add_argument("--any-format", action="store_true",
+                          help="允许改变格式：JPEG / WebP / 调色板 PNG 竞争取最小")
+    compress.add_argument("--no-cache", action="store_true", help="不使用压缩结果缓存")
+    
+    convert = subparsers.add_parser("convert", help="格式转换")
+    add_common(convert)
+    convert.add_argument("--format", required=True, choices=TARGET_FORMATS, help="目标格式")
+    convert.add_argument("--combine", metavar="NAME",
+                         help="合并为输出目录下的一个 PDF（需 --format pdf），按输入顺序每张一页")
+    convert.add_argument("--page-size", choices=tuple(PAGE_SIZES), default="auto",
+                         help="合并 PDF 的页面尺寸，auto 按图片尺寸和 DPI")
+    convert.add_argument("--incremental", action="store_true",
+                         help="只转换新增或修改过的文件（按输出目录中的清单判断）")
+    convert.add_argument("--page-fit", choices=FIT_MODES, default=FIT_MODES[0],
+                         help="固定页面尺寸时的放置方式：fit 完整显示 / fill 铺满裁切")
+    
+    watermark = subparsers.add_parser("watermark", help="添加水印")
+    add_common(watermark)
+    source = watermark.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text", help="文字水印内容")
+    source.add_argument("--image", help="图片水印路径")
+    watermark.add_argument("--position", choices=POSITIONS, default="center", help="水印位置")
+    watermark.add_argument("--opacity", type=int, default=50, help="不透明度 (0-100)")
+    watermark.add_argument("--font-size", type=int, default=48, help="文字大小")
+    watermark.add_argument("--color", type=parse_color, default=(255, 255, 255),
+                           help="文字颜色 #RRGGBB")
+    watermark.add_argument("--scale", type=int, default=20, help="图片水印宽度占比 (%%)")
+    
+    similar = subparsers.add_parser("similar", help="查找相似图片（缩放副本、重新保存的 JPEG 等）")
+    similar.add_argument("inputs", nargs="+", help="图片文件、目录或通配符（支持 **）")
+    similar.add_argument("-j", "--jobs", type=int, default=default_workers(),
+                         help="并行进程数，默认CPU核心数")
+    similar.add_argument("--distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                         help="感知哈希的汉明距离阈值 (0-64)，越大越宽松")
+    
+    return parser
+
+
+def make_task(args):
+    """根据子命令构造任务函数（functools.partial，可被进程池 pickle）"""
+    budget_mp = args.budget_mp or config.get("large_image_budget_mp", 50)
+    
+    if args.command == "compress":
+        ssim_threshold = args.ssim
+        if ssim_threshold is None and args.mode == SmartCompressor.MODE_VISUALLY_LOSSLESS:
+            ssim_threshold = config.get("visually_lossless_ssim", 0.99)
+        fit = args.fit
+        if args.long_edge:
+            fit = (args.long_edge, args.long_edge)
+        settings = {
+            "mode": args.mode,
+            "quality": args.quality,
+            "resize": args.resize,
+            "fit": fit,
+            "target_size": args.target_size * 1024 if args.target_size else None,
+            "ssim_threshold": ssim_threshold,
+            "png_colors": args.png_colors,
+            "png_dither": not args.no_dither,
+            "png_exhaustive": args.png_exhaustive,
+            "effort": args.effort,
+            "allow_format_change": args.any_format,
+            "budget_mp": budget_mp
+        }
+        cache_dir = None
+        if not args.no_cache and config.get("compress_cache_enabled", True):
+            cache_dir = str(get_cache_dir())
+        return partial(compress_task, settings=settings, output_dir=args.output,
+                       cache_dir=cache_dir), cache_dir
+    
+    if args.command == "convert":
+        return partial(convert_task, target_format=args.format, output_dir=args.output), None
+    
+    watermark_config = {
+        "type": "text" if args.text is not None else "image",
+        "opacity": args.opacity,
+        "position": args.position
+    }
+    if args.text is not None:
+        watermark_config.update(text=args.text, font_size=args.font_size, color=args.color)
+    else:
+        watermark_config.update(image_path=args.image, scale=args.scale)
+    return partial(watermark_task, watermark_config=watermark_config, output_dir=args.output,
+                   budget_mp=budget_mp), None
+
+
+def main(argv: list = None) -> int:
+    """命令行主函数，返回退出码"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    # 日志输出到标准错误，标准输出只用于 JSON 进度
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        stream=sys.stderr,
+        force=True
+    )
+    
+    if args.command == "compress" and args.mode == SmartCompressor.MODE_TARGET_SIZE \
+            and not args.target_size:
+        parser.error("target 模式需要 --target-size")
+    if args.command == "convert" and args.combine and args.format != "pdf":
+        parser.error("--combine 需要 --format pdf")
+    if args.command == "watermark" and args.image and not os.path.isfile(args.image):
+        parser.error(f"水印图片不存在: {args.image}")
+    
+    files = expand_inputs(args.inputs)
+    if not files:
+        emit("done", total=0, success=0, failed=0, error="没有找到可处理的文件")
+        return EXIT_USAGE
+    
+    if args.command == "similar":
+        try:
+            run_similar(files, args.distance, max(1, args.jobs))
+        except KeyboardInterrupt:
+            emit("interrupted")
+            return EXIT_INTERRUPTED
+        return EXIT_OK
+    
+    os.makedirs(args.output, exist_ok=True)
+    
+    if args.command == "convert" and args.combine:
+        output_path = os.path.join(args.output, args.combine)
+        try:
+            failed = run_combine(files, output_path, args.page_size, args.page_fit)
+        except KeyboardInterrupt:
+            emit("interrupted")
+            return EXIT_INTERRUPTED
+        return EXIT_FAILED if failed else EXIT_OK
+    
+    task, cache_dir = make_task(args)
+    
+    manifest = None
+    on_success = None
+    if args.command == "convert" and args.incremental:
+        manifest = Manifest(args.output, {"command": "convert", "format": args.format})
+        stale = manifest.stale(files)
+        emit("skip", total=len(files), skipped=len(files) - len(stale))
+        files = stale
+        on_success = lambda file_path, result: manifest.record(file_path, result["output"])
+    
+    try:
+        memory_budget = resolve_memory_budget(
+            args.memory_mb or config.get("parallel_memory_budget_mb", 0)
+        )
+        failed = run_batch(task, files, max(1, args.jobs), memory_budget, on_success)
+    except KeyboardInterrupt:
+        emit("interrupted")
+        return EXIT_INTERRUPTED
+    finally:
+        # 中断时也保存已完成的部分
+        if manifest is not None:
+            manifest.save()
+    
+    if cache_dir:
+        max_bytes = config.get("compress_cache_max_mb", 1024) * 1024 * 1024
+        ResultCache(cache_dir, max_bytes).evict()
+    
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    # 打包后的程序启动多进程子进程时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -3,10 +3,11 @@
 - 配置管理
 - 日志记录
 - 错误处理
+
+ErrorHandler 依赖 Qt，按需导入：命令行等无界面场景只使用配置和日志
 """
 from .config import config, Config
 from .logger import setup_logging, get_all_log_files, read_log_file
-from .error_handler import ErrorHandler
 
 __all__ = [
     'config',
@@ -16,3 +17,10 @@ __all__ = [
     'read_log_file',
     'ErrorHandler'
 ]
+
+
+def __getattr__(name):
+    if name == 'ErrorHandler':
+        from .error_handler import ErrorHandler
+        return ErrorHandler
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -26,6 +26,12 @@ class Config:
         "show_preview": True,  # 显示预览
         "animation_enabled": True,  # 启用动画
         "animation_duration": 300,  # 动画时长(ms)
+        "visually_lossless_ssim": 0.99,  # 视觉无损模式的 SSIM 阈值
+        "compress_cache_enabled": True,  # 启用压缩结果缓存
+        "compress_cache_max_mb": 1024,  # 压缩结果缓存上限(MB)
+        "large_image_budget_mp": 50,  # 超过该像素数(百万)的图片走有界内存路径
+        "decode_cache_mb": 512,  # 预览用解码图片缓存上限(MB)
+        "parallel_memory_budget_mb": 0,  # 并行处理的内存预算(MB)，0 表示物理内存的一半
     }
     
     def __new__(cls):
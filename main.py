@@ -3,19 +3,13 @@
 Cheese Cloud Tools - Main Entry
 """
 import sys
+import multiprocessing
 from pathlib import Path
 
 # 添加项目根目录到路径
 PROJECT_ROOT = Path(__file__).parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from PySide6.QtWidgets import QApplication
-from PySide6.QtGui import QFont
-
-from core.logger import setup_logging
-from core.error_handler import ErrorHandler
-from ui.main_window import MainWindow
-
 
 def load_stylesheet() -> str:
     """加载样式表"""
@@ -28,9 +22,26 @@ def load_stylesheet() -> str:
 
 def main():
     """主函数"""
+    # Qt 相关模块在此导入：多进程子进程会重新执行本模块顶层代码，
+    # 放在函数内可避免每个子进程都加载整套界面
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtGui import QFont
+    
+    from core.logger import setup_logging
+    from core.error_handler import ErrorHandler
+    from core.config import config
+    from tools.image.decoded_cache import decoded_images
+    from tools.image.large import budget_pixels
+    from ui.main_window import MainWindow
+    
     # 初始化日志
     setup_logging()
     
+    # 预览时复用解码结果（只在界面进程启用）
+    decoded_images.max_bytes = config.get("decode_cache_mb", 512) * 1024 * 1024
+    # 超过大图预算的图片走有界内存路径，不进缓存
+    decoded_images.max_pixels = budget_pixels(config.get("large_image_budget_mp", 50))
+    
     # 创建应用
     app = QApplication(sys.argv)
     app.setApplicationName("奶酪云工具箱")
@@ -57,5 +68,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的程序启动多进程子进程时需要
+    multiprocessing.freeze_support()
     main()
 
@@ -3,13 +3,26 @@
 - 压缩
 - 格式转换
 - 水印
+
+页面类按需导入：引擎模块（如 compressor）可在不加载 Qt 的子进程中单独使用
 """
-from .compress import ImageCompressPage
-from .convert import ImageConvertPage
-from .watermark import ImageWatermarkPage
+import importlib
+
+_PAGES = {
+    'ImageCompressPage': '.compress',
+    'ImageConvertPage': '.convert',
+    'ImageWatermarkPage': '.watermark',
+}
 
 __all__ = [
     'ImageCompressPage',
     'ImageConvertPage',
     'ImageWatermarkPage'
 ]
+
+
+def __getattr__(name):
+    if name in _PAGES:
+        module = importlib.import_module(_PAGES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
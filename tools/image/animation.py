@@ -0,0 +1,176 @@
+"""
+动画图片压缩（GIF / WebP）
+- 用 ImageSequence 逐帧处理，保留全部帧、帧时长和循环次数
+- GIF：所有帧共用一个调色板，未变化的区域由编码器裁剪 / 填充透明
+- WebP：libwebp 动画编码器自动只编码变化的矩形，允许逐帧选择有损 / 无损
+- 不依赖 Qt
+"""
+import io
+import math
+from PIL import Image, ImageSequence
+
+
+# 生成共享调色板时的采样像素总数上限
+PALETTE_SAMPLE_PIXELS = 4_000_000
+# 低于该 alpha 值的像素视为透明（GIF 只支持完全透明）
+ALPHA_THRESHOLD = 128
+
+
+def is_animated(img: Image.Image) -> bool:
+    """是否为多帧动画"""
+    return getattr(img, "is_animated", False) and getattr(img, "n_frames", 1) > 1
+
+
+def iter_frames(img: Image.Image, size: tuple = None):
+    """
+    逐帧产出合成后的 RGBA 图像
+    
+    Yields:
+        (frame, duration)
+    """
+    for frame in ImageSequence.Iterator(img):
+        # WebP 插件在帧加载时才写入 info["duration"]，先转换（加载）再读取
+        rgba = frame.convert('RGBA')
+        duration = frame.info.get("duration", 100)
+        if size and rgba.size != size:
+            # 大幅缩小时先按整数倍 reduce，再做剩余的 LANCZOS
+            rgba = rgba.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        yield rgba, duration
+
+
+def compress_gif(img: Image.Image, size: tuple = None, max_colors: int = 255) -> bytes:
+    """
+    重新编码 GIF 动画
+    
+    Args:
+        img: 已打开的动画 GIF
+        size: 输出尺寸，为 None 时保持原尺寸
+        max_colors: 共享调色板的颜色数上限（另保留一个透明色）
+    
+    Returns:
+        GIF 数据
+    """
+    width, height = size or img.size
+    scale = min(1.0, math.sqrt(PALETTE_SAMPLE_PIXELS / (img.n_frames * width * height)))
+    sample_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    
+    # 第一遍：统计颜色、透明度和帧时长，采样用于生成调色板
+    colors = set()
+    exact = True
+    has_alpha = False
+    durations = []
+    samples = []
+    for frame, duration in iter_frames(img, size):
+        durations.append(duration)
+        if frame.getchannel('A').getextrema()[0] < ALPHA_THRESHOLD:
+            has_alpha = True
+        rgb = frame.convert('RGB')
+        if exact:
+            found = rgb.getcolors(max_colors)
+            if found is None:
+                exact = False
+            else:
+                colors.update(color for _, color in found)
+                exact = len(colors) <= max_colors
+        samples.append(rgb.resize(sample_size, Image.Resampling.NEAREST))
+    
+    palette_colors = sorted(colors) if exact else _median_cut(samples, max_colors)
+    samples.clear()
+    
+    # 透明色使用调色板中不存在的颜色，避免编码器按颜色重映射时混淆
+    transparent_index = len(palette_colors)
+    used = set(palette_colors)
+    transparent_color = next(
+        (c, c, c + 1) for c in range(255) if (c, c, c + 1) not in used
+    )
+    
+    mapping = Image.new('P', (1, 1))
+    mapping.putpalette([v for color in palette_colors for v in color])
+    full_palette = [v for color in palette_colors + [transparent_color] for v in color]
+    
+    def frames():
+        # 第二遍：按共享调色板映射（不抖动，保证静止区域逐帧一致）
+        for frame, _ in iter_frames(img, size):
+            indexed = frame.convert('RGB').quantize(palette=mapping, dither=Image.Dither.NONE)
+            indexed.putpalette(full_palette)
+            if has_alpha:
+                mask = frame.getchannel('A').point(
+                    lambda a: 255 if a < ALPHA_THRESHOLD else 0, mode='1'
+                )
+                indexed.paste(transparent_index, mask=mask)
+            yield indexed
+    
+    sequence = frames()
+    first = next(sequence)
+    buffer = io.BytesIO()
+    first.save(
+        buffer,
+        "GIF",
+        save_all=True,
+        append_images=sequence,
+        duration=durations,
+        loop=img.info.get("loop", 0),
+        palette=bytes(full_palette),
+        transparency=transparent_index,
+        # 有透明像素时每帧先恢复背景，否则保留上一帧，只写入变化区域
+        disposal=2 if has_alpha else 1,
+        optimize=True
+    )
+    return buffer.getvalue()
+
+
+def _median_cut(samples: list, max_colors: int) -> list:
+    """把所有帧的采样拼接后做中位切分，得到共享调色板"""
+    width, height = samples[0].size
+    mosaic = Image.new('RGB', (width, height * len(samples)))
+    for i, sample in enumerate(samples):
+        mosaic.paste(sample, (0, i * height))
+    
+    quantized = mosaic.quantize(max_colors, method=Image.Quantize.MEDIANCUT)
+    flat = quantized.getpalette()
+    colors = []
+    for _, index in quantized.getcolors(256):
+        color = tuple(flat[index * 3:index * 3 + 3])
+        if color not in colors:
+            colors.append(color)
+    return colors
+
+
+def compress_webp(img: Image.Image, quality: int, lossless: bool = False,
+                  size: tuple = None, method: int = 6) -> bytes:
+    """
+    重新编码 WebP 动画
+    
+    Args:
+        img: 已打开的动画 WebP
+        quality: 有损质量（无损时为压缩力度）
+        lossless: 是否无损
+        size: 输出尺寸，为 None 时保持原尺寸
+        method: 编码力度 (0-6)
+    
+    Returns:
+        WebP 数据
+    """
+    frames = []
+    durations = []
+    for frame, duration in iter_frames(img, size):
+        frames.append(frame)
+        durations.append(duration)
+    
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer,
+        "WEBP",
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=img.info.get("loop", 0),
+        background=img.info.get("background", (0, 0, 0, 0)),
+        lossless=lossless,
+        quality=quality,
+        method=method,
+        # 只编码变化的子矩形，并允许每帧在有损 / 无损之间择优
+        minimize_size=True,
+        allow_mixed=not lossless
+    )
+    return buffer.getvalue()
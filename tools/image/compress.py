@@ -6,282 +6,256 @@
 - 智能参数优化
 """
 import os
-import io
 import logging
+import tempfile
+from functools import partial
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from PIL import Image
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QSlider, QFrame, QFileDialog, QMessageBox,
     QProgressBar, QListWidget, QListWidgetItem, QCheckBox,
-    QGroupBox, QRadioButton, QButtonGroup, QComboBox
+    QGroupBox, QRadioButton, QButtonGroup, QComboBox, QSpinBox
 )
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, Signal, QTimer
 from PySide6.QtGui import QFont
 
 from ui.workspace import BaseWorkspace, UploadArea
 from ui.image_preview import DualPreviewWidget
+from ui.duplicate_scanner import DuplicateScanner
+from ui.similar_dialog import SimilarImagesDialog
 from core.config import config
-
-
-class SmartCompressor:
-    """智能图片压缩器 - 保持原格式，极致压缩"""
-    
-    # 压缩模式
-    MODE_VISUALLY_LOSSLESS = "visually"  # 视觉无损（推荐）
-    MODE_BALANCED = "balanced"           # 均衡模式
-    MODE_MAXIMUM = "maximum"             # 极致压缩
-    MODE_LOSSLESS = "lossless"           # 完全无损
-    
-    @classmethod
-    def compress(cls, img: Image.Image, original_format: str, mode: str,
-                 quality_override: int = None) -> tuple:
-        """
-        压缩图片（保持原格式）
-        
-        Args:
-            img: PIL Image对象
-            original_format: 原始格式 (jpeg/png/webp)
-            mode: 压缩模式
-            quality_override: 手动覆盖质量值
-            
-        Returns:
-            (compressed_data, output_extension)
-        """
-        # 标准化格式名
-        fmt = original_format.lower()
-        if fmt in ['jpg', 'jpeg']:
-            return cls._compress_jpeg(img, mode, quality_override)
-        elif fmt == 'png':
-            return cls._compress_png(img, mode)
-        elif fmt == 'webp':
-            return cls._compress_webp(img, mode, quality_override)
-        elif fmt == 'gif':
-            return cls._compress_gif(img)
-        else:
-            # 未知格式，转为JPEG压缩
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                if img.mode in ('RGBA', 'LA'):
-                    background.paste(img, mask=img.split()[-1])
-                else:
-                    background.paste(img)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            return cls._compress_jpeg(img, mode, quality_override)
-    
-    @classmethod
-    def _compress_jpeg(cls, img: Image.Image, mode: str, quality_override: int = None) -> tuple:
-        """JPEG极致压缩"""
-        # 确保是RGB模式
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            if img.mode in ('RGBA', 'LA'):
-                background.paste(img, mask=img.split()[-1])
-            else:
-                background.paste(img)
-            img = background
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        buffer = io.BytesIO()
-        
-        # 根据模式选择参数
-        if quality_override is not None:
-            quality = quality_override
-        else:
-            quality = {
-                cls.MODE_LOSSLESS: 100,
-                cls.MODE_VISUALLY_LOSSLESS: 88,  # 视觉无损的最佳质量
-                cls.MODE_BALANCED: 80,
-                cls.MODE_MAXIMUM: 70,
-            }.get(mode, 85)
-        
-        # 子采样设置：quality高时用4:4:4保持质量
-        if quality >= 90:
-            subsampling = 0  # 4:4:4
-        elif quality >= 80:
-            subsampling = 1  # 4:2:2
-        else:
-            subsampling = 2  # 4:2:0
-        
-        img.save(
-            buffer, 
-            "JPEG",
-            quality=quality,
-            optimize=True,
-            subsampling=subsampling,
-            progressive=True
-        )
-        
-        return buffer.getvalue(), ".jpg"
-    
-    @classmethod
-    def _compress_png(cls, img: Image.Image, mode: str) -> tuple:
-        """PNG压缩（无损，但优化）"""
-        buffer = io.BytesIO()
-        
-        # PNG是无损格式，只能通过优化来减小
-        # 对于极致压缩模式，尝试减少颜色
-        if mode == cls.MODE_MAXIMUM:
-            # 检查是否可以用调色板模式
-            if img.mode == 'RGBA':
-                colors = img.getcolors(maxcolors=256)
-                if colors:
-                    img = img.convert('P', palette=Image.Palette.ADAPTIVE, colors=len(colors))
-            elif img.mode == 'RGB':
-                colors = img.getcolors(maxcolors=256)
-                if colors:
-                    img = img.convert('P', palette=Image.Palette.ADAPTIVE, colors=len(colors))
-        
-        img.save(
-            buffer,
-            "PNG",
-            optimize=True,
-            compress_level=9  # 最大压缩级别
-        )
-        
-        return buffer.getvalue(), ".png"
-    
-    @classmethod
-    def _compress_webp(cls, img: Image.Image, mode: str, quality_override: int = None) -> tuple:
-        """WebP压缩"""
-        buffer = io.BytesIO()
-        
-        if mode == cls.MODE_LOSSLESS:
-            img.save(buffer, "WEBP", lossless=True, quality=100)
-        else:
-            if quality_override is not None:
-                quality = quality_override
-            else:
-                quality = {
-                    cls.MODE_VISUALLY_LOSSLESS: 88,
-                    cls.MODE_BALANCED: 80,
-                    cls.MODE_MAXIMUM: 70,
-                }.get(mode, 85)
-            
-            img.save(
-                buffer,
-                "WEBP",
-                quality=quality,
-                method=6  # 最慢但压缩率最高
-            )
-        
-        return buffer.getvalue(), ".webp"
-    
-    @classmethod
-    def _compress_gif(cls, img: Image.Image) -> tuple:
-        """GIF保持原样（GIF压缩会丢失动画）"""
-        buffer = io.BytesIO()
-        img.save(buffer, "GIF", optimize=True)
-        return buffer.getvalue(), ".gif"
+from tools.image.compressor import SmartCompressor, compress_file, preview_crop
+from tools.image.parallel import run_in_pool, default_workers, resolve_memory_budget
+from tools.image.result_cache import ResultCache, get_cache_dir
+from tools.image.result_store import ResultStore
+from tools.image.dedup import output_name_for
+from tools.image.similar import find_similar
 
 
 class CompressWorker(QThread):
     """压缩工作线程"""
     progress = Signal(int, int)
-    file_processed = Signal(str, bytes, dict)
+    file_processed = Signal(str, str, dict)  # 源文件, 暂存文件路径, 信息
     finished = Signal(list)
     
     def __init__(self, files: list, compress_mode: str, quality: int = None,
-                 resize_percent: int = 100):
+                 resize_percent: int = 100, fit: tuple = None, parallel: bool = False,
+                 max_workers: int = None, target_size: int = None,
+                 ssim_threshold: float = None, cache_dir: str = None,
+                 cache_max_bytes: int = None, spool_dir: str = None,
+                 png_colors: int = None, png_dither: bool = True,
+                 png_exhaustive: bool = False,
+                 effort: str = SmartCompressor.EFFORT_MAX,
+                 allow_format_change: bool = False, budget_mp: float = None,
+                 memory_budget: int = None):
         super().__init__()
         self.files = files
         self.compress_mode = compress_mode
         self.quality = quality
         self.resize_percent = resize_percent
+        # 等比缩小到 (宽, 高) 以内，为 None 时只按百分比缩放
+        self.fit = fit
+        self.target_size = target_size
+        self.ssim_threshold = ssim_threshold
+        self.png_colors = png_colors
+        self.png_dither = png_dither
+        self.png_exhaustive = png_exhaustive
+        self.effort = effort
+        self.allow_format_change = allow_format_change
+        self.budget_mp = budget_mp
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        # 压缩结果写入暂存目录，信号中只传路径
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix="nltools_spool_")
+        self.parallel = parallel
+        self.max_workers = max_workers
+        # 并行时按内存预算准入（字节），为 None 时只按进程数限制
+        self.memory_budget = memory_budget
+    
+    @property
+    def settings(self) -> dict:
+        return {
+            "mode": self.compress_mode,
+            "quality": self.quality,
+            "resize": self.resize_percent,
+            "fit": self.fit,
+            "target_size": self.target_size,
+            "ssim_threshold": self.ssim_threshold,
+            "png_colors": self.png_colors,
+            "png_dither": self.png_dither,
+            "png_exhaustive": self.png_exhaustive,
+            "effort": self.effort,
+            "allow_format_change": self.allow_format_change,
+            "budget_mp": self.budget_mp
+        }
     
     def run(self):
-        results = []
+        if self.parallel and len(self.files) > 1:
+            results = self._run_parallel()
+        else:
+            results = self._run_serial()
+        
+        # 批次结束后按上限淘汰缓存
+        if self.cache_dir and self.cache_max_bytes:
+            ResultCache(self.cache_dir, self.cache_max_bytes).evict()
+        
+        self.finished.emit(results)
+    
+    def _run_serial(self, files: list = None, results: list = None) -> list:
+        results = results if results is not None else []
         total = len(self.files)
         
-        for i, file_path in enumerate(self.files):
+        for file_path in (self.files if files is None else files):
             try:
                 result = self.compress_image(file_path)
                 results.append(result)
-                
-                if result.get("success") and result.get("data"):
-                    self.file_processed.emit(
-                        file_path, 
-                        result["data"],
-                        {
-                            "size": result["compressed_size"],
-                            "name": result.get("output_name", ""),
-                            "original_size": result["original_size"]
-                        }
-                    )
+                self._emit_result(result)
             except Exception as e:
                 logging.error(f"压缩失败 {file_path}: {e}")
-                results.append({
-                    "file": file_path,
-                    "success": False,
-                    "error": str(e)
-                })
+                results.append(self._error_result(file_path, e))
             
-            self.progress.emit(i + 1, total)
+            self.progress.emit(len(results), total)
         
-        self.finished.emit(results)
+        return results
+    
+    def _run_parallel(self) -> list:
+        """多进程并行压缩，结果按完成顺序返回"""
+        results = []
+        total = len(self.files)
+        task = partial(compress_file, settings=self.settings,
+                       cache_dir=self.cache_dir, spool_dir=self.spool_dir)
+        
+        logging.info(f"并行压缩 {total} 个文件, 进程数: {self.max_workers or default_workers()}")
+        
+        try:
+            for file_path, result, error in run_in_pool(
+                task, self.files, self.max_workers, memory_budget=self.memory_budget
+            ):
+                if isinstance(error, BrokenProcessPool):
+                    # 进程池崩溃导致的失败不是文件本身的问题，稍后单线程重试
+                    continue
+                if error is not None:
+                    logging.error(f"压缩失败 {file_path}: {error}")
+                    result = self._error_result(file_path, error)
+                else:
+                    self._emit_result(result)
+                results.append(result)
+                
+                self.progress.emit(len(results), total)
+        except Exception as e:
+            # 进程池无法启动等情况，剩余文件回退到单线程处理
+            logging.warning(f"并行压缩不可用，回退到单线程: {e}")
+        
+        # 进程池没有真正处理的文件（未提交或因进程池崩溃失败）单线程重试
+        finished = {r["file"] for r in results}
+        remaining = [f for f in self.files if f not in finished]
+        if remaining:
+            logging.warning(f"进程池未完成 {len(remaining)} 个文件，回退到单线程处理")
+            self._run_serial(remaining, results)
+        
+        return results
+    
+    def _emit_result(self, result: dict):
+        if result.get("success") and result.get("path"):
+            self.file_processed.emit(
+                result["file"],
+                result["path"],
+                {
+                    "size": result["compressed_size"],
+                    "name": result.get("output_name", ""),
+                    "original_size": result["original_size"],
+                    "quality": result.get("quality"),
+                    "ssim": result.get("ssim"),
+                    "colors": result.get("colors"),
+                    "encode_time": result.get("encode_time"),
+                    "format": result.get("format")
+                }
+            )
+    
+    @staticmethod
+    def _error_result(file_path: str, error: Exception) -> dict:
+        return {
+            "file": file_path,
+            "success": False,
+            "error": str(error)
+        }
     
     def compress_image(self, file_path: str) -> dict:
         """压缩单个图片"""
-        original_size = os.path.getsize(file_path)
-        original_ext = Path(file_path).suffix.lower()
-        
-        # 获取原始格式
-        original_format = original_ext.lstrip('.')
+        return compress_file(file_path, self.settings, self.cache_dir, self.spool_dir)
+
+
+class LivePreviewWorker(QThread):
+    """实时预览工作线程：只压缩可见区域并推算整图大小"""
+    preview_ready = Signal(int, bytes, dict)  # 请求序号, 数据, 信息
+    
+    def __init__(self, serial: int, file_path: str, settings: dict, crop_size: tuple):
+        super().__init__()
+        self.serial = serial
+        self.file_path = file_path
+        self.settings = settings
+        self.crop_size = crop_size
+    
+    def run(self):
+        try:
+            result = preview_crop(self.file_path, self.settings, self.crop_size)
+        except Exception as e:
+            logging.error(f"实时预览失败 {self.file_path}: {e}")
+            return
         
-        with Image.open(file_path) as img:
-            original_width, original_height = img.size
-            
-            # 调整尺寸（如果需要）
-            if self.resize_percent < 100:
-                new_width = int(original_width * self.resize_percent / 100)
-                new_height = int(original_height * self.resize_percent / 100)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 压缩（保持原格式）
-            compressed_data, ext = SmartCompressor.compress(
-                img,
-                original_format,
-                self.compress_mode,
-                self.quality
-            )
-            
-            compressed_size = len(compressed_data)
-            
-            # 如果压缩后反而变大，使用原文件
-            if compressed_size >= original_size and self.resize_percent == 100:
-                with open(file_path, 'rb') as f:
-                    compressed_data = f.read()
-                compressed_size = original_size
-                ext = original_ext
-            
-            output_name = Path(file_path).stem + "_compressed" + ext
-            
-            return {
-                "file": file_path,
-                "output_name": output_name,
-                "original_size": original_size,
-                "compressed_size": compressed_size,
-                "ratio": (1 - compressed_size / original_size) * 100 if original_size > 0 else 0,
-                "success": True,
-                "data": compressed_data
-            }
+        if result is not None:
+            self.preview_ready.emit(self.serial, result.pop("data"), result)
+
+
+class SimilarImagesWorker(QThread):
+    """相似图片分析线程：缩小解码计算感知哈希并分组"""
+    groups_ready = Signal(list)
+    
+    def __init__(self, files: list, max_workers: int = 1):
+        super().__init__()
+        self.files = files
+        self.max_workers = max_workers
+    
+    def run(self):
+        try:
+            groups = find_similar(self.files, max_workers=self.max_workers)
+        except Exception as e:
+            logging.error(f"相似图片分析失败: {e}")
+            groups = []
+        self.groups_ready.emit(groups)
 
 
 class ImageCompressPage(BaseWorkspace):
     """图片压缩页面"""
     
+    # 滑块停止变化多久后压缩可见区域 / 停止操作多久后完整压缩（毫秒）
+    LIVE_PREVIEW_DELAY = 150
+    FULL_PREVIEW_DELAY = 1000
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.files = []
         self.current_file_index = 0
-        self.processed_results = {}
+        # 结果数据在磁盘暂存目录中，内存里只保留元数据
+        self.processed_results = ResultStore()
+        # 字节相同的输入只压缩一次
+        self.duplicate_scanner = DuplicateScanner(self)
+        self.duplicate_scanner.duplicates_found.connect(self.on_duplicates_found)
+        
+        # 实时预览：请求序号用于丢弃过期结果，同一时间只运行一个预览线程
+        self.live_serial = 0
+        self.live_worker = None
+        self.live_pending = False
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(self.LIVE_PREVIEW_DELAY)
+        self.live_timer.timeout.connect(self.start_live_preview)
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(self.FULL_PREVIEW_DELAY)
+        self.idle_timer.timeout.connect(self.on_interaction_idle)
+        
         self.setup_compress_ui()
     
     def setup_compress_ui(self):
@@ -348,6 +322,7 @@ class ImageCompressPage(BaseWorkspace):
             ("balanced", "⚖️ 均衡模式", "平衡质量与压缩率"),
             ("maximum", "🚀 极致压缩", "最大压缩，可能有轻微损失"),
             ("lossless", "💎 完全无损", "100%保留原质量"),
+            ("target", "🎯 目标大小", "自动调整质量，使每张图不超过指定大小"),
         ]
         
         for i, mode_data in enumerate(modes):
@@ -366,6 +341,8 @@ class ImageCompressPage(BaseWorkspace):
             desc_label.setStyleSheet("color: #64748b; font-size: 10px;")
             mode_layout.addWidget(desc_label)
         
+        self.mode_group.buttonToggled.connect(self.on_mode_changed)
+        
         settings_layout.addWidget(mode_group)
         
         # ====== 高级设置 ======
@@ -393,16 +370,86 @@ class ImageCompressPage(BaseWorkspace):
         quality_row.addWidget(self.quality_label)
         advanced_layout.addLayout(quality_row)
         
+        # 目标大小
+        target_row = QHBoxLayout()
+        target_row.addWidget(QLabel("目标大小:"))
+        self.target_size_spin = QSpinBox()
+        self.target_size_spin.setRange(10, 50 * 1024)
+        self.target_size_spin.setValue(200)
+        self.target_size_spin.setSuffix(" KB")
+        self.target_size_spin.setEnabled(False)
+        target_row.addWidget(self.target_size_spin, 1)
+        advanced_layout.addLayout(target_row)
+        
         # 缩放
         resize_row = QHBoxLayout()
         resize_row.addWidget(QLabel("尺寸:"))
         self.resize_combo = QComboBox()
-        self.resize_combo.addItem("100% 原尺寸", 100)
-        self.resize_combo.addItem("75%", 75)
-        self.resize_combo.addItem("50%", 50)
+        # (缩放百分比, 等比缩小到的尺寸上限)
+        self.resize_combo.addItem("100% 原尺寸", (100, None))
+        self.resize_combo.addItem("75%", (75, None))
+        self.resize_combo.addItem("50%", (50, None))
+        self.resize_combo.addItem("适应 3840×2160", (100, (3840, 2160)))
+        self.resize_combo.addItem("适应 1920×1080", (100, (1920, 1080)))
+        self.resize_combo.addItem("长边 2048", (100, (2048, 2048)))
+        self.resize_combo.addItem("长边 1280", (100, (1280, 1280)))
         resize_row.addWidget(self.resize_combo, 1)
         advanced_layout.addLayout(resize_row)
         
+        # 编码力度
+        effort_row = QHBoxLayout()
+        effort_row.addWidget(QLabel("编码速度:"))
+        self.effort_combo = QComboBox()
+        self.effort_combo.addItem("极致（最小体积）", SmartCompressor.EFFORT_MAX)
+        self.effort_combo.addItem("标准", SmartCompressor.EFFORT_DEFAULT)
+        self.effort_combo.addItem("快速（最快速度）", SmartCompressor.EFFORT_FAST)
+        self.effort_combo.setToolTip("影响 WebP 编码方法和 PNG 压缩级别，JPEG 不受影响")
+        effort_row.addWidget(self.effort_combo, 1)
+        advanced_layout.addLayout(effort_row)
+        
+        # 多编码器竞争
+        self.format_race_check = QCheckBox("允许改变格式（JPEG / WebP / PNG 取最小）")
+        self.format_race_check.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        self.format_race_check.setToolTip(
+            "同时尝试多种格式，保留通过画质下限 (SSIM) 的最小结果；完全无损和目标大小模式下不生效"
+        )
+        advanced_layout.addWidget(self.format_race_check)
+        
+        # 多核并行
+        self.parallel_check = QCheckBox(f"多核并行处理 ({default_workers()} 核)")
+        self.parallel_check.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        self.parallel_check.setChecked(default_workers() > 1)
+        advanced_layout.addWidget(self.parallel_check)
+        
+        # PNG 有损量化
+        self.png_quantize_check = QCheckBox("PNG 有损量化（调色板）")
+        self.png_quantize_check.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        self.png_quantize_check.setToolTip("将 PNG 量化为调色板图片，质量检查不达标时自动保持无损")
+        self.png_quantize_check.stateChanged.connect(self.on_png_quantize_changed)
+        advanced_layout.addWidget(self.png_quantize_check)
+        
+        png_row = QHBoxLayout()
+        png_row.addWidget(QLabel("颜色数:"))
+        self.png_colors_spin = QSpinBox()
+        self.png_colors_spin.setRange(2, 256)
+        self.png_colors_spin.setValue(256)
+        self.png_colors_spin.setEnabled(False)
+        png_row.addWidget(self.png_colors_spin, 1)
+        self.png_dither_check = QCheckBox("抖动")
+        self.png_dither_check.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        self.png_dither_check.setChecked(True)
+        self.png_dither_check.setEnabled(False)
+        png_row.addWidget(self.png_dither_check)
+        advanced_layout.addLayout(png_row)
+        
+        # PNG 穷举优化
+        self.png_exhaustive_check = QCheckBox("PNG 穷举优化（较慢）")
+        self.png_exhaustive_check.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        self.png_exhaustive_check.setToolTip(
+            "并行尝试多种行滤波与 zlib 策略，调色板图片另外尝试调色板重排，保留最小的结果"
+        )
+        advanced_layout.addWidget(self.png_exhaustive_check)
+        
         settings_layout.addWidget(advanced_group)
         
         # ====== 文件列表 ======
@@ -416,6 +463,13 @@ class ImageCompressPage(BaseWorkspace):
         files_header.addWidget(self.files_count)
         files_header.addStretch()
         
+        self.similar_btn = QPushButton("🔍 相似")
+        self.similar_btn.setObjectName("secondary_btn")
+        self.similar_btn.setFixedWidth(70)
+        self.similar_btn.setToolTip("查找缩放副本、重新保存的 JPEG 等相似图片，压缩前移除多余的")
+        self.similar_btn.clicked.connect(self.find_similar_images)
+        files_header.addWidget(self.similar_btn)
+        
         clear_btn = QPushButton("清空")
         clear_btn.setObjectName("secondary_btn")
         clear_btn.setFixedWidth(50)
@@ -464,27 +518,119 @@ class ImageCompressPage(BaseWorkspace):
         if self.manual_quality_check.isChecked():
             quality = self.quality_slider.value()
         
-        resize_percent = self.resize_combo.currentData()
+        resize_percent, fit = self.resize_combo.currentData()
         
-        return {"mode": mode, "quality": quality, "resize": resize_percent}
+        target_size = None
+        if mode == "target":
+            target_size = self.target_size_spin.value() * 1024
+        
+        # 视觉无损模式按 SSIM 自动选择质量
+        ssim_threshold = None
+        if mode == "visually":
+            ssim_threshold = config.get("visually_lossless_ssim", 0.99)
+        
+        png_colors = None
+        if self.png_quantize_check.isChecked() and mode != "lossless":
+            png_colors = self.png_colors_spin.value()
+        
+        return {"mode": mode, "quality": quality, "resize": resize_percent, "fit": fit,
+                "target_size": target_size, "ssim_threshold": ssim_threshold,
+                "png_colors": png_colors, "png_dither": self.png_dither_check.isChecked(),
+                "png_exhaustive": self.png_exhaustive_check.isChecked(),
+                "effort": self.effort_combo.currentData(),
+                "allow_format_change": self.format_race_check.isChecked(),
+                "budget_mp": config.get("large_image_budget_mp", 50)}
+    
+    @staticmethod
+    def get_cache_options() -> dict:
+        """获取结果缓存设置"""
+        if not config.get("compress_cache_enabled", True):
+            return {"cache_dir": None, "cache_max_bytes": None}
+        return {
+            "cache_dir": str(get_cache_dir()),
+            "cache_max_bytes": config.get("compress_cache_max_mb", 1024) * 1024 * 1024
+        }
+    
+    def on_mode_changed(self, button, checked: bool):
+        if checked:
+            is_target = button.property("mode_id") == "target"
+            self.target_size_spin.setEnabled(is_target)
+            self.manual_quality_check.setEnabled(not is_target)
+    
+    def on_png_quantize_changed(self, state):
+        enabled = state == Qt.CheckState.Checked.value
+        self.png_colors_spin.setEnabled(enabled)
+        self.png_dither_check.setEnabled(enabled)
     
     def on_manual_quality_changed(self, state):
         self.quality_slider.setEnabled(state == Qt.CheckState.Checked.value)
     
     def on_quality_changed(self, value: int):
         self.quality_label.setText(f"{value}%")
+        
+        # 拖动时先预览可见区域，停止操作后再完整压缩
+        if self.files and self.quality_slider.isEnabled():
+            self.live_timer.start()
+            self.idle_timer.start()
+    
+    def start_live_preview(self):
+        """压缩当前文件的可见区域"""
+        if not self.files:
+            return
+        if self.live_worker is not None and self.live_worker.isRunning():
+            # 上一次还没完成，完成后用最新设置再预览一次
+            self.live_pending = True
+            return
+        
+        self.live_serial += 1
+        viewport = self.preview_widget.viewport_size()
+        self.live_worker = LivePreviewWorker(
+            self.live_serial,
+            self.files[self.current_file_index],
+            self.get_compress_settings(),
+            (viewport.width(), viewport.height())
+        )
+        self.live_worker.preview_ready.connect(self.on_live_preview_ready)
+        self.live_worker.finished.connect(self.on_live_worker_finished)
+        self.live_worker.start()
+    
+    def on_live_worker_finished(self):
+        if self.live_pending:
+            self.live_pending = False
+            self.start_live_preview()
+    
+    def on_live_preview_ready(self, serial: int, data: bytes, info: dict):
+        if serial == self.live_serial:
+            self.preview_widget.set_live_result(data, info)
+    
+    def on_interaction_idle(self):
+        """停止操作后完整压缩当前文件"""
+        if not self.files:
+            return
+        busy = (not self.preview_btn.isEnabled() or not self.compress_btn.isEnabled()
+                or (self.live_worker is not None and self.live_worker.isRunning()))
+        if self.quality_slider.isSliderDown() or busy:
+            self.idle_timer.start()
+            return
+        self.preview_current()
+    
+    def cancel_live_preview(self):
+        """切换 / 清空文件时停止计时并丢弃未完成的实时预览"""
+        self.live_timer.stop()
+        self.idle_timer.stop()
+        self.live_pending = False
+        self.live_serial += 1
     
     def on_files_added(self, files: list):
         valid_exts = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
-        for file_path in files:
-            if file_path.lower().endswith(valid_exts):
-                if file_path not in self.files:
-                    self.files.append(file_path)
-                    size = os.path.getsize(file_path)
-                    size_str = self.format_size(size)
-                    item = QListWidgetItem(f"📷 {Path(file_path).name} ({size_str})")
-                    item.setData(Qt.ItemDataRole.UserRole, file_path)
-                    self.files_list.addItem(item)
+        valid = [f for f in files if f.lower().endswith(valid_exts)]
+        for file_path in self.duplicate_scanner.add(valid):
+            self.files.append(file_path)
+            size = os.path.getsize(file_path)
+            size_str = self.format_size(size)
+            item = QListWidgetItem(f"📷 {Path(file_path).name} ({size_str})")
+            item.setData(Qt.ItemDataRole.UserRole, file_path)
+            self.files_list.addItem(item)
         
         self.files_count.setText(str(len(self.files)))
         
@@ -493,20 +639,95 @@ class ImageCompressPage(BaseWorkspace):
             self.preview_widget.set_original(self.files[0])
             self.current_file_index = 0
     
+    def on_duplicates_found(self, found: dict):
+        """标记与已添加文件内容相同的文件，已有结果的直接复用"""
+        for file_path, original in found.items():
+            item = self.files_list.item(self.files.index(file_path))
+            item.setText(f"{item.text()} · 与 {Path(original).name} 相同")
+            item.setToolTip(f"{file_path}\n内容与 {original} 相同，批量压缩时复用其结果")
+            if original in self.processed_results:
+                self.share_result(original, file_path)
+        logging.info(f"发现 {len(found)} 个重复文件，批量压缩时将跳过")
+    
+    def share_result(self, original: str, file_path: str):
+        """把原文件的压缩结果登记给内容相同的文件"""
+        output_name = output_name_for(
+            file_path, original, self.processed_results[original]["output_name"]
+        )
+        self.processed_results.share(file_path, original, output_name=output_name)
+    
+    def find_similar_images(self):
+        """分析待压缩文件中的相似图片"""
+        files = self.duplicate_scanner.unique(self.files)
+        if len(files) < 2:
+            QMessageBox.information(self, "提示", "至少需要两张不同的图片")
+            return
+        
+        self.similar_btn.setEnabled(False)
+        self.similar_btn.setText("分析中...")
+        workers = default_workers() if self.parallel_check.isChecked() else 1
+        self.similar_worker = SimilarImagesWorker(files, workers)
+        self.similar_worker.groups_ready.connect(self.on_similar_groups)
+        self.similar_worker.start()
+        logging.info(f"开始分析 {len(files)} 张图片的相似度")
+    
+    def on_similar_groups(self, groups: list):
+        self.similar_btn.setEnabled(True)
+        self.similar_btn.setText("🔍 相似")
+        if not groups:
+            QMessageBox.information(self, "相似图片", "没有发现相似图片")
+            return
+        
+        logging.info(f"发现 {len(groups)} 组相似图片")
+        dialog = SimilarImagesDialog(groups, self)
+        if dialog.exec() and dialog.selected_paths():
+            self.remove_files(dialog.selected_paths())
+    
+    def remove_files(self, paths: list):
+        """从待压缩列表中移除文件（连同与之内容相同的文件）"""
+        removed = set(paths)
+        for path in paths:
+            removed.update(self.duplicate_scanner.copies_of(path))
+        
+        current = self.files[self.current_file_index] if self.files else None
+        for path in removed:
+            self.processed_results.remove(path)
+        self.duplicate_scanner.remove(list(removed))
+        self.files = [f for f in self.files if f not in removed]
+        for row in reversed(range(self.files_list.count())):
+            if self.files_list.item(row).data(Qt.ItemDataRole.UserRole) in removed:
+                self.files_list.takeItem(row)
+        self.files_count.setText(str(len(self.files)))
+        logging.info(f"已移除 {len(removed)} 个文件")
+        
+        if current in removed:
+            self.cancel_live_preview()
+            self.current_file_index = 0
+            if self.files:
+                self.files_list.setCurrentRow(0)
+                self.preview_widget.set_original(self.files[0])
+            else:
+                self.preview_widget.clear()
+        elif current is not None:
+            self.current_file_index = self.files.index(current)
+    
     def on_file_clicked(self, item: QListWidgetItem):
         file_path = item.data(Qt.ItemDataRole.UserRole)
+        self.cancel_live_preview()
         self.current_file_index = self.files.index(file_path)
         self.preview_widget.set_original(file_path)
         
         if file_path in self.processed_results:
             result = self.processed_results[file_path]
             self.preview_widget.set_result(
-                result["data"],
+                self.processed_results.read(file_path),
                 {"size": result["compressed_size"], "name": result["output_name"]},
                 result["output_name"]
             )
     
     def clear_files(self):
+        self.cancel_live_preview()
+        self.duplicate_scanner.clear()
         self.files.clear()
         self.files_list.clear()
         self.files_count.setText("0")
@@ -525,21 +746,37 @@ class ImageCompressPage(BaseWorkspace):
         self.preview_btn.setText("处理中...")
         
         self.worker = CompressWorker(
-            [file_path], settings["mode"], settings["quality"], settings["resize"]
+            [file_path], settings["mode"], settings["quality"], settings["resize"],
+            fit=settings["fit"],
+            target_size=settings["target_size"],
+            ssim_threshold=settings["ssim_threshold"],
+            png_colors=settings["png_colors"],
+            png_dither=settings["png_dither"],
+            png_exhaustive=settings["png_exhaustive"],
+            effort=settings["effort"],
+            allow_format_change=settings["allow_format_change"],
+            budget_mp=settings["budget_mp"],
+            spool_dir=self.processed_results.spool_dir,
+            **self.get_cache_options()
         )
         self.worker.file_processed.connect(self.on_preview_ready)
         self.worker.finished.connect(lambda: self.preview_btn.setEnabled(True))
         self.worker.finished.connect(lambda: self.preview_btn.setText("👁️ 预览效果"))
         self.worker.start()
     
-    def on_preview_ready(self, file_path: str, data: bytes, info: dict):
+    def on_preview_ready(self, file_path: str, spool_path: str, info: dict):
         output_name = info.get("name", Path(file_path).stem + "_compressed.jpg")
-        self.preview_widget.set_result(data, info, output_name)
-        self.processed_results[file_path] = {
-            "data": data,
-            "compressed_size": info.get("size", len(data)),
-            "output_name": output_name
-        }
+        self.processed_results.add(file_path, spool_path, {
+            "compressed_size": info.get("size", 0),
+            "output_name": output_name,
+            "quality": info.get("quality"),
+            "ssim": info.get("ssim"),
+            "colors": info.get("colors")
+        })
+        self.preview_widget.set_result(
+            self.processed_results.read(file_path), info, output_name
+        )
+        self.show_quality_report(file_path, info)
     
     def start_compress_all(self):
         if not self.files:
@@ -547,13 +784,29 @@ class ImageCompressPage(BaseWorkspace):
             return
         
         settings = self.get_compress_settings()
+        files = self.duplicate_scanner.unique(self.files)
+        if len(files) < len(self.files):
+            logging.info(f"跳过 {len(self.files) - len(files)} 个重复文件，复用相同内容的压缩结果")
         
         self.compress_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         
         self.worker = CompressWorker(
-            self.files, settings["mode"], settings["quality"], settings["resize"]
+            files, settings["mode"], settings["quality"], settings["resize"],
+            fit=settings["fit"],
+            parallel=self.parallel_check.isChecked(),
+            memory_budget=resolve_memory_budget(config.get("parallel_memory_budget_mb", 0)),
+            target_size=settings["target_size"],
+            ssim_threshold=settings["ssim_threshold"],
+            png_colors=settings["png_colors"],
+            png_dither=settings["png_dither"],
+            png_exhaustive=settings["png_exhaustive"],
+            effort=settings["effort"],
+            allow_format_change=settings["allow_format_change"],
+            budget_mp=settings["budget_mp"],
+            spool_dir=self.processed_results.spool_dir,
+            **self.get_cache_options()
         )
         self.worker.progress.connect(self.on_progress)
         self.worker.file_processed.connect(self.on_file_processed)
@@ -563,17 +816,47 @@ class ImageCompressPage(BaseWorkspace):
     def on_progress(self, current: int, total: int):
         self.progress_bar.setValue(int(current / total * 100))
     
-    def on_file_processed(self, file_path: str, data: bytes, info: dict):
+    def on_file_processed(self, file_path: str, spool_path: str, info: dict):
         output_name = info.get("name", Path(file_path).stem + "_compressed.jpg")
-        self.processed_results[file_path] = {
-            "data": data,
-            "compressed_size": info.get("size", len(data)),
+        self.processed_results.add(file_path, spool_path, {
+            "compressed_size": info.get("size", 0),
             "output_name": output_name,
-            "original_size": info.get("original_size", 0)
-        }
+            "original_size": info.get("original_size", 0),
+            "quality": info.get("quality"),
+            "ssim": info.get("ssim"),
+            "colors": info.get("colors")
+        })
+        self.show_quality_report(file_path, info)
+        for copy_path in self.duplicate_scanner.copies_of(file_path):
+            self.share_result(file_path, copy_path)
+        
+        # 只有当前预览的文件（或与之内容相同的文件）才从暂存读取数据
+        current = self.files[self.current_file_index]
+        if current == file_path or self.duplicate_scanner.original_of(current) == file_path:
+            self.preview_widget.set_result(
+                self.processed_results.read(current), info,
+                self.processed_results[current]["output_name"]
+            )
+    
+    def show_quality_report(self, file_path: str, info: dict):
+        """在文件列表中显示实际使用的质量（或调色板颜色数）与 SSIM 评分"""
+        if info.get("quality") is not None:
+            report = f"Q{info['quality']}"
+        elif info.get("colors") is not None:
+            report = f"{info['colors']} 色"
+        else:
+            return
+        
+        if info.get("format"):
+            report = f"{info['format'].upper()} {report}"
+        if info.get("ssim") is not None:
+            report += f" · SSIM {info['ssim']:.4f}"
         
-        if self.files.index(file_path) == self.current_file_index:
-            self.preview_widget.set_result(data, info, output_name)
+        item = self.files_list.item(self.files.index(file_path))
+        size_str = self.format_size(info.get("size", 0))
+        item.setText(f"📷 {Path(file_path).name} → {size_str} · {report}")
+        item.setToolTip(f"{file_path}\n{report}")
+        logging.info(f"压缩 {Path(file_path).name}: {report}")
     
     def on_compress_finished(self, results: list):
         self.compress_btn.setEnabled(True)
@@ -594,8 +877,36 @@ class ImageCompressPage(BaseWorkspace):
         else:
             msg = f"压缩完成!\n✅ 成功: {success}/{len(results)}"
         
+        copies = sum(len(self.duplicate_scanner.copies_of(r["file"]))
+                     for r in results if r.get("success"))
+        if copies:
+            msg += f"\n🔁 重复文件: {copies} 个（已复用结果）"
+        
+        timing = self.format_encode_times(results)
+        if timing:
+            msg += f"\n\n{timing}"
+        
         QMessageBox.information(self, "完成", msg)
     
+    def format_encode_times(self, results: list) -> str:
+        """汇总每个文件的编码耗时（缓存命中的文件不计入）"""
+        timed = [r for r in results
+                 if r.get("success") and not r.get("cached") and r.get("encode_time") is not None]
+        cached = sum(1 for r in results if r.get("success") and r.get("cached"))
+        if not timed:
+            return f"⚡ 全部 {cached} 个文件命中缓存" if cached else ""
+        
+        times = [r["encode_time"] for r in timed]
+        slowest = max(timed, key=lambda r: r["encode_time"])
+        for r in timed:
+            logging.info(f"编码耗时 {Path(r['file']).name}: {r['encode_time'] * 1000:.0f} ms")
+        
+        text = (f"⏱️ 编码耗时: 平均 {sum(times) / len(times) * 1000:.0f} ms/文件, "
+                f"最慢 {slowest['encode_time'] * 1000:.0f} ms ({Path(slowest['file']).name})")
+        if cached:
+            text += f"\n⚡ 缓存命中: {cached} 个文件"
+        return text
+    
     def on_file_saved(self, path):
         logging.info(f"已保存: {path}")
     
@@ -611,10 +922,12 @@ class ImageCompressPage(BaseWorkspace):
             return
         
         saved = 0
-        for fp, result in self.processed_results.items():
+        for fp, result in list(self.processed_results.items()):
             try:
-                with open(os.path.join(output_dir, result["output_name"]), 'wb') as f:
-                    f.write(result["data"])
+                # 硬链接/移动暂存文件，不重新写入数据
+                self.processed_results.export(
+                    fp, os.path.join(output_dir, result["output_name"])
+                )
                 saved += 1
             except Exception as e:
                 logging.error(f"保存失败: {e}")
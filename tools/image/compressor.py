@@ -0,0 +1,924 @@
+"""
+图片压缩引擎
+- 不依赖 Qt，可在子进程 / 命令行中直接调用
+- SmartCompressor: 保持原格式的极致压缩
+- compress_file: 单文件压缩任务（可被进程池调度）
+"""
+import os
+import io
+import time
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image, features
+
+from tools.image import animation
+from tools.image.quality import (
+    luma_plane, luma_size, ssim, ssim_of_encoded, chroma_edge_fraction
+)
+from tools.image.result_cache import ResultCache, file_digest
+from tools.image.result_store import spool_file, spool_copy
+from tools.image.large import is_large, flatten_to_rgb, make_proxy
+from tools.image.decoded_cache import open_image
+from tools.image.png_optimizer import optimize_png
+
+
+# 缩小时 reduce 预缩放后保留给 LANCZOS 的最小倍数（越大越接近纯 LANCZOS 的效果）
+REDUCING_GAP = 3.0
+
+
+class SmartCompressor:
+    """智能图片压缩器 - 保持原格式，极致压缩"""
+    
+    # 压缩模式
+    MODE_VISUALLY_LOSSLESS = "visually"  # 视觉无损（推荐）
+    MODE_BALANCED = "balanced"           # 均衡模式
+    MODE_MAXIMUM = "maximum"             # 极致压缩
+    MODE_LOSSLESS = "lossless"           # 完全无损
+    MODE_TARGET_SIZE = "target"          # 目标大小
+    
+    # 目标大小模式的搜索范围
+    TARGET_MIN_QUALITY = 30
+    TARGET_MAX_QUALITY = 95
+    TARGET_RESIZE_STEP = 0.8   # 最低质量仍超出时，每次缩小到 80%
+    TARGET_MIN_SIDE = 64       # 缩小的下限（短边像素）
+    
+    # 视觉无损模式：按 SSIM 自动选择质量
+    DEFAULT_SSIM_THRESHOLD = 0.99
+    AUTO_MIN_QUALITY = 60
+    AUTO_MAX_QUALITY = 95
+    
+    # JPEG 色度子采样：缩略图上强色度边缘占比超过该值时用 4:4:4，否则 4:2:0
+    CHROMA_EDGE_FRACTION = 0.0005
+    # 不低于该质量时总是 4:4:4
+    FULL_CHROMA_QUALITY = 95
+    
+    # PNG 有损调色板量化：在缩小后的亮度图上检查质量，抖动噪点在该尺度下会被平均
+    PALETTE_CHECK_SIDE = 512
+    PALETTE_MIN_SSIM = 0.97
+    
+    # 编码力度预设：在速度与体积之间取舍
+    EFFORT_FAST = "fast"
+    EFFORT_DEFAULT = "default"
+    EFFORT_MAX = "max"
+    EFFORT_PRESETS = {
+        EFFORT_FAST: {"webp_method": 2, "png_level": 1, "png_optimize": False},
+        EFFORT_DEFAULT: {"webp_method": 4, "png_level": 6, "png_optimize": False},
+        EFFORT_MAX: {"webp_method": 6, "png_level": 9, "png_optimize": True},
+    }
+    
+    @classmethod
+    def compress(cls, img: Image.Image, original_format: str, mode: str,
+                 quality_override: int = None, target_size: int = None,
+                 ssim_threshold: float = None, report: dict = None,
+                 png_colors: int = None, png_dither: bool = True,
+                 effort: str = EFFORT_MAX, png_exhaustive: bool = False) -> tuple:
+        """
+        压缩图片（保持原格式）
+        
+        Args:
+            img: PIL Image对象
+            original_format: 原始格式 (jpeg/png/webp)
+            mode: 压缩模式
+            quality_override: 手动覆盖质量值
+            target_size: 目标大小（字节），仅目标大小模式使用
+            ssim_threshold: 视觉无损模式的 SSIM 阈值，为 None 时使用固定质量
+            report: 可选字典，写入实际使用的质量 / SSIM 评分
+            png_colors: PNG 有损量化的最大颜色数，为 None 时 PNG 保持无损
+            png_dither: PNG 量化时是否使用抖动
+            effort: 编码力度预设 (fast/default/max)，影响 WebP method 和 PNG 压缩级别
+            png_exhaustive: PNG 穷举滤波 / zlib 策略（调色板图片另加调色板重排）取最小
+            
+        Returns:
+            (compressed_data, output_extension)
+        """
+        # 标准化格式名
+        fmt = original_format.lower()
+        if mode == cls.MODE_TARGET_SIZE and target_size:
+            return cls._compress_to_target(img, fmt, target_size, effort)
+        
+        if report is None:
+            report = {}
+        
+        if fmt in ['jpg', 'jpeg']:
+            return cls._compress_jpeg(img, mode, quality_override, ssim_threshold, report)
+        elif fmt == 'png':
+            return cls._compress_png(img, mode, png_colors, png_dither, report, effort,
+                                     png_exhaustive)
+        elif fmt == 'webp':
+            return cls._compress_webp(img, mode, quality_override, ssim_threshold, report,
+                                      effort)
+        elif fmt == 'gif':
+            return cls._compress_gif(img)
+        else:
+            # 未知格式，转为JPEG压缩
+            return cls._compress_jpeg(cls._to_rgb(img), mode, quality_override,
+                                      ssim_threshold, report)
+    
+    @classmethod
+    def compress_large(cls, img: Image.Image, original_format: str, mode: str,
+                       quality_override: int = None, ssim_threshold: float = None,
+                       report: dict = None, effort: str = EFFORT_MAX) -> tuple:
+        """
+        超大图片的有界内存压缩（保持原格式）
+        
+        - 有损格式在缩小的代理图上按 SSIM 搜索质量，全尺寸只编码一次
+        - 透明背景按条带合成，不产生额外的全尺寸中间图
+        - PNG 跳过调色板量化，直接无损编码
+        """
+        fmt = original_format.lower()
+        if report is None:
+            report = {}
+        
+        if fmt == 'png':
+            return cls._compress_png(img, mode, None, True, report, effort)
+        elif fmt == 'gif':
+            return cls._compress_gif(img)
+        elif fmt == 'webp':
+            if mode == cls.MODE_LOSSLESS:
+                return cls._compress_webp(img, mode, report=report, effort=effort)
+            compress = partial(cls._compress_webp, effort=effort)
+            encode = partial(cls._encode_webp, method=cls._webp_method(effort))
+        else:
+            img = flatten_to_rgb(img)
+            compress = cls._compress_jpeg
+            # 代理图上只搜索质量，渐进式 / 基线式在全尺寸编码时再比较
+            encode = partial(cls._encode_jpeg, subsampling=cls._jpeg_subsampling(img),
+                             progressive=True)
+        
+        if cls._use_auto_quality(mode, quality_override, ssim_threshold):
+            # SSIM 评分同样来自代理图
+            cls._auto_quality(make_proxy(img), encode, ssim_threshold, report)
+            quality_override = report["quality"]
+        return compress(img, mode, quality_override, None, report)
+    
+    @staticmethod
+    def _to_rgb(img: Image.Image) -> Image.Image:
+        """转为RGB（透明区域填充白色）"""
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            if img.mode in ('RGBA', 'LA'):
+                background.paste(img, mask=img.split()[-1])
+            else:
+                background.paste(img)
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        return img
+    
+    @classmethod
+    def _compress_jpeg(cls, img: Image.Image, mode: str, quality_override: int = None,
+                       ssim_threshold: float = None, report: dict = None) -> tuple:
+        """JPEG极致压缩"""
+        # 确保是RGB模式
+        img = cls._to_rgb(img)
+        
+        if cls._use_auto_quality(mode, quality_override, ssim_threshold):
+            # SSIM 只看亮度，子采样由色度分析决定；两种扫描方式解码结果相同，
+            # 搜索时只编码渐进式，确定质量后再与基线式比较
+            if report is None:
+                report = {}
+            subsampling = cls._jpeg_subsampling(img)
+            data = cls._auto_quality(
+                img, partial(cls._encode_jpeg, subsampling=subsampling, progressive=True),
+                ssim_threshold, report
+            )
+            baseline = cls._encode_jpeg(img, report["quality"], subsampling, progressive=False)
+            return min(data, baseline, key=len), ".jpg"
+        
+        # 根据模式选择参数
+        if quality_override is not None:
+            quality = quality_override
+        else:
+            quality = {
+                cls.MODE_LOSSLESS: 100,
+                cls.MODE_VISUALLY_LOSSLESS: 88,  # 视觉无损的最佳质量
+                cls.MODE_BALANCED: 80,
+                cls.MODE_MAXIMUM: 70,
+            }.get(mode, 85)
+        
+        if report is not None:
+            report["quality"] = quality
+        return cls._encode_jpeg(img, quality), ".jpg"
+    
+    @classmethod
+    def _encode_jpeg(cls, img: Image.Image, quality: int, subsampling: int = None,
+                     progressive: bool = None) -> bytes:
+        """
+        按指定质量编码JPEG（img 需为RGB）
+        
+        Args:
+            subsampling: 0 为 4:4:4，2 为 4:2:0，为 None 时按图片内容选择
+            progressive: 为 None 时渐进式 / 基线式各编码一次取较小者（解码结果相同）
+        """
+        if subsampling is None:
+            subsampling = cls._jpeg_subsampling(img, quality)
+        
+        smallest = None
+        for scan in ((True, False) if progressive is None else (progressive,)):
+            buffer = io.BytesIO()
+            img.save(
+                buffer,
+                "JPEG",
+                quality=quality,
+                optimize=True,
+                subsampling=subsampling,
+                progressive=scan
+            )
+            if smallest is None or buffer.tell() < len(smallest):
+                smallest = buffer.getvalue()
+        return smallest
+    
+    @classmethod
+    def _jpeg_subsampling(cls, img: Image.Image, quality: int = None) -> int:
+        """
+        按内容选择色度子采样
+        
+        照片的色度变化平缓，4:2:0 几乎无损且体积明显更小；
+        截图、彩色文字等锐利的色度边缘在 4:2:0 下会发糊，保留 4:4:4
+        """
+        if quality is not None and quality >= cls.FULL_CHROMA_QUALITY:
+            return 0
+        fraction = chroma_edge_fraction(img)
+        subsampling = 0 if fraction > cls.CHROMA_EDGE_FRACTION else 2
+        logging.debug(f"色度边缘占比 {fraction:.4%}，使用 {'4:4:4' if subsampling == 0 else '4:2:0'}")
+        return subsampling
+    
+    @classmethod
+    def _compress_png(cls, img: Image.Image, mode: str, png_colors: int = None,
+                      png_dither: bool = True, report: dict = None,
+                      effort: str = EFFORT_MAX, exhaustive: bool = False) -> tuple:
+        """PNG压缩（默认无损优化；指定 png_colors 时尝试有损调色板量化）"""
+        source = img
+        
+        # PNG是无损格式，只能通过优化来减小
+        # 对于极致压缩模式，尝试减少颜色
+        if mode == cls.MODE_MAXIMUM:
+            # 检查是否可以用调色板模式
+            if img.mode == 'RGBA':
+                colors = img.getcolors(maxcolors=256)
+                if colors:
+                    img = img.convert('P', palette=Image.Palette.ADAPTIVE, colors=len(colors))
+            elif img.mode == 'RGB':
+                colors = img.getcolors(maxcolors=256)
+                if colors:
+                    img = img.convert('P', palette=Image.Palette.ADAPTIVE, colors=len(colors))
+        
+        data = cls._encode_png(img, effort, exhaustive)
+        
+        # 有损量化（完全无损模式除外），通过质量检查且更小时才采用
+        if png_colors and mode != cls.MODE_LOSSLESS:
+            quantized = cls._quantize_png(source, png_colors, png_dither, report, effort,
+                                          exhaustive)
+            if quantized is not None and len(quantized) < len(data):
+                return quantized, ".png"
+            if report is not None:
+                report.clear()
+        
+        return data, ".png"
+    
+    @classmethod
+    def _quantize_png(cls, img: Image.Image, colors: int, dither: bool,
+                      report: dict = None, effort: str = EFFORT_MAX,
+                      exhaustive: bool = False):
+        """
+        PNG 调色板量化（带质量检查）
+        
+        Returns:
+            量化后的 PNG 数据，质量不达标时返回 None
+        """
+        source, quantized = cls._palettize(img, colors, dither)
+        
+        # 质量检查
+        size = luma_size(source.size, cls.PALETTE_CHECK_SIDE)
+        score = ssim(luma_plane(source, size), luma_plane(quantized.convert(source.mode), size))
+        if score < cls.PALETTE_MIN_SSIM:
+            logging.debug(f"PNG 量化质量不足 (SSIM {score:.4f})，保持无损")
+            return None
+        
+        data = cls._encode_png(quantized, effort, exhaustive)
+        
+        if report is not None:
+            report["colors"] = len(quantized.getcolors(256) or [])
+            report["ssim"] = round(score, 4)
+        return data
+    
+    @staticmethod
+    def _has_alpha(img: Image.Image) -> bool:
+        """是否含有透明通道"""
+        return img.mode in ('RGBA', 'LA', 'PA') or (
+            img.mode == 'P' and 'transparency' in img.info
+        )
+    
+    @classmethod
+    def _palettize(cls, img: Image.Image, colors: int, dither: bool) -> tuple:
+        """
+        生成调色板图片
+        
+        - 有透明通道：libimagequant（可用时）或快速八叉树，保留 alpha
+        - 不透明：libimagequant（可用时）或中位切分生成调色板，
+          再按设置决定是否用 Floyd-Steinberg 抖动重新映射
+        
+        Returns:
+            (source, quantized) - 转换后的 RGB/RGBA 源图与 P 模式结果
+        """
+        colors = max(2, min(256, colors))
+        has_alpha = cls._has_alpha(img)
+        source = img.convert('RGBA' if has_alpha else 'RGB')
+        if has_alpha and source.getextrema()[3][0] == 255:
+            # alpha 全不透明，按不透明图片处理
+            source = source.convert('RGB')
+            has_alpha = False
+        
+        liq = features.check_feature("libimagequant")
+        if has_alpha:
+            # Pillow 的调色板重映射不支持 RGBA，抖动由 libimagequant 自行决定
+            method = Image.Quantize.LIBIMAGEQUANT if liq else Image.Quantize.FASTOCTREE
+            quantized = source.quantize(colors, method=method)
+        else:
+            method = Image.Quantize.LIBIMAGEQUANT if liq else Image.Quantize.MEDIANCUT
+            quantized = source.quantize(colors, method=method)
+            if dither or liq:
+                quantized = source.quantize(
+                    palette=quantized,
+                    dither=Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+                )
+        return source, quantized
+    
+    @classmethod
+    def _encode_png(cls, img: Image.Image, effort: str, exhaustive: bool = False) -> bytes:
+        """编码 PNG：按力度预设保存，或穷举滤波 / zlib 策略取最小（只有 max 预设做完整穷举）"""
+        if exhaustive:
+            level = cls._png_options(effort)["compress_level"]
+            return optimize_png(img, level, full_search=effort == cls.EFFORT_MAX)
+        buffer = io.BytesIO()
+        img.save(buffer, "PNG", **cls._png_options(effort))
+        return buffer.getvalue()
+    
+    @classmethod
+    def _png_options(cls, effort: str) -> dict:
+        """PNG 保存参数（optimize 会强制使用最高压缩级别）"""
+        preset = cls.EFFORT_PRESETS.get(effort, cls.EFFORT_PRESETS[cls.EFFORT_MAX])
+        return {"optimize": preset["png_optimize"], "compress_level": preset["png_level"]}
+    
+    @classmethod
+    def _webp_method(cls, effort: str) -> int:
+        """WebP method 参数（0 最快，6 最慢但压缩率最高）"""
+        preset = cls.EFFORT_PRESETS.get(effort, cls.EFFORT_PRESETS[cls.EFFORT_MAX])
+        return preset["webp_method"]
+    
+    @classmethod
+    def _compress_webp(cls, img: Image.Image, mode: str, quality_override: int = None,
+                       ssim_threshold: float = None, report: dict = None,
+                       effort: str = EFFORT_MAX) -> tuple:
+        """WebP压缩"""
+        method = cls._webp_method(effort)
+        if mode == cls.MODE_LOSSLESS:
+            buffer = io.BytesIO()
+            img.save(buffer, "WEBP", lossless=True, quality=100, method=method)
+            return buffer.getvalue(), ".webp"
+        
+        encode = partial(cls._encode_webp, method=method)
+        if cls._use_auto_quality(mode, quality_override, ssim_threshold):
+            return cls._auto_quality(img, encode, ssim_threshold, report), ".webp"
+        
+        quality = cls._webp_quality(mode, quality_override)
+        if report is not None:
+            report["quality"] = quality
+        return encode(img, quality), ".webp"
+    
+    @classmethod
+    def _webp_quality(cls, mode: str, quality_override: int = None) -> int:
+        """WebP 各模式的固定质量"""
+        if quality_override is not None:
+            return quality_override
+        return {
+            cls.MODE_VISUALLY_LOSSLESS: 88,
+            cls.MODE_BALANCED: 80,
+            cls.MODE_MAXIMUM: 70,
+        }.get(mode, 85)
+    
+    @staticmethod
+    def _encode_webp(img: Image.Image, quality: int, method: int = 6) -> bytes:
+        """按指定质量编码WebP（method 6 最慢但压缩率最高）"""
+        buffer = io.BytesIO()
+        img.save(
+            buffer,
+            "WEBP",
+            quality=quality,
+            method=method
+        )
+        return buffer.getvalue()
+    
+    @classmethod
+    def compress_smallest(cls, img: Image.Image, quality_override: int = None,
+                          ssim_threshold: float = None, report: dict = None,
+                          effort: str = EFFORT_MAX, png_colors: int = None,
+                          png_dither: bool = True, png_exhaustive: bool = False,
+                          mode: str = MODE_VISUALLY_LOSSLESS) -> tuple:
+        """
+        多编码器竞争（不要求保持原格式）
+        
+        同时编码为 JPEG / WebP / 调色板 PNG，所有结果用同一参考图计算 SSIM，
+        取通过质量下限的最小结果；都未通过时取 SSIM 最高的结果。
+        视觉无损模式下 JPEG / WebP 按 SSIM 下限搜索质量；平衡 / 极限模式使用各自的
+        固定质量，下限取这些有损结果中最低的 SSIM（调色板 PNG 不能比它们更差）。
+        Pillow 编码时释放 GIL，各编码器在线程中并行执行；
+        Pillow 把保存参数记在图片对象上（encoderinfo），因此每个线程使用自己的副本
+        
+        Returns:
+            (compressed_data, output_extension)
+        """
+        img.load()
+        fixed_quality = mode in (cls.MODE_BALANCED, cls.MODE_MAXIMUM)
+        floor = ssim_threshold or cls.DEFAULT_SSIM_THRESHOLD
+        # 固定质量模式不做 SSIM 搜索
+        search_floor = None if fixed_quality else floor
+        reference = luma_plane(img)
+        
+        def encode(fmt: str) -> tuple:
+            result = {}
+            source = img.copy()
+            if fmt == "jpeg":
+                data, ext = cls._compress_jpeg(source, mode, quality_override,
+                                               search_floor, result)
+            elif fmt == "webp":
+                data, ext = cls._compress_webp(source, mode, quality_override,
+                                               search_floor, result, effort)
+            else:
+                _, quantized = cls._palettize(source, png_colors or 256, png_dither)
+                data, ext = cls._encode_png(quantized, effort, png_exhaustive), ".png"
+                result["colors"] = len(quantized.getcolors(256) or [])
+            if "ssim" not in result:
+                result["ssim"] = round(ssim_of_encoded(reference, data), 4)
+            result["format"] = ext.lstrip('.')
+            return data, ext, result
+        
+        # JPEG 不支持透明，含透明像素的图片不参与
+        formats = ["webp", "png"]
+        if not (cls._has_alpha(img) and img.convert('RGBA').getextrema()[3][0] < 255):
+            formats.insert(0, "jpeg")
+        
+        with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+            candidates = list(executor.map(encode, formats))
+        
+        if fixed_quality:
+            floor = min(c[2]["ssim"] for c in candidates if c[2]["format"] != "png")
+        
+        passed = [c for c in candidates if c[2]["ssim"] >= floor]
+        if passed:
+            data, ext, result = min(passed, key=lambda c: len(c[0]))
+        else:
+            data, ext, result = max(candidates, key=lambda c: c[2]["ssim"])
+            logging.debug(f"没有编码器达到 SSIM {floor}，使用评分最高的 {result['format']}")
+        
+        logging.debug("编码器竞争: " + ", ".join(
+            f"{c[2]['format']} {len(c[0])}B SSIM {c[2]['ssim']}" for c in candidates
+        ))
+        if report is not None:
+            report.update(result)
+        return data, ext
+    
+    @classmethod
+    def compress_animation(cls, img: Image.Image, original_format: str, mode: str,
+                           quality_override: int = None, size: tuple = None,
+                           report: dict = None, effort: str = EFFORT_MAX) -> tuple:
+        """
+        压缩动画 GIF / WebP（保留全部帧）
+        
+        SSIM 自动质量和目标大小只针对单帧，动画使用模式对应的固定参数
+        
+        Returns:
+            (compressed_data, output_extension)
+        """
+        if original_format.lower() == 'gif':
+            return animation.compress_gif(img, size), ".gif"
+        
+        method = cls._webp_method(effort)
+        if mode == cls.MODE_LOSSLESS:
+            return animation.compress_webp(img, 100, lossless=True, size=size,
+                                           method=method), ".webp"
+        
+        quality = cls._webp_quality(mode, quality_override)
+        if report is not None:
+            report["quality"] = quality
+        return animation.compress_webp(img, quality, size=size, method=method), ".webp"
+    
+    @classmethod
+    def _compress_gif(cls, img: Image.Image) -> tuple:
+        """静态GIF压缩（动画见 compress_animation）"""
+        buffer = io.BytesIO()
+        img.save(buffer, "GIF", optimize=True)
+        return buffer.getvalue(), ".gif"
+    
+    @classmethod
+    def _compress_to_target(cls, img: Image.Image, fmt: str, target_size: int,
+                            effort: str = EFFORT_MAX) -> tuple:
+        """
+        压缩到目标大小以内
+        
+        源图只解码一次，所有尝试都编码到内存缓冲区：
+        有损格式先二分查找质量，仍超出时逐步缩小尺寸再查找；
+        JPEG 搜索时只编码渐进式，确定质量后再与基线式比较一次
+        """
+        if fmt in ['jpg', 'jpeg']:
+            base, ext = cls._to_rgb(img), ".jpg"
+            encode = partial(cls._encode_jpeg, subsampling=cls._jpeg_subsampling(base),
+                             progressive=True)
+        elif fmt == 'webp':
+            encode = partial(cls._encode_webp, method=cls._webp_method(effort))
+            base, ext = img, ".webp"
+        elif fmt == 'png':
+            base, ext = img, ".png"
+            encode = None
+        elif fmt == 'gif':
+            base, ext = img, ".gif"
+            encode = None
+        else:
+            base, ext = cls._to_rgb(img), ".jpg"
+            encode = partial(cls._encode_jpeg, subsampling=cls._jpeg_subsampling(base),
+                             progressive=True)
+        
+        base.load()
+        work = base
+        smallest = None
+        
+        while True:
+            if encode is not None:
+                quality, data = cls._bisect_quality(
+                    lambda q: encode(work, q),
+                    lambda q, d: len(d) <= target_size,
+                    cls.TARGET_MIN_QUALITY, cls.TARGET_MAX_QUALITY
+                )
+                if ext == ".jpg":
+                    baseline = encode(work, quality, progressive=False)
+                    data = min(data, baseline, key=len)
+            elif ext == ".png":
+                data = cls._compress_png(work, cls.MODE_MAXIMUM, effort=effort)[0]
+            else:
+                data = cls._compress_gif(work)[0]
+            
+            if smallest is None or len(data) < len(smallest):
+                smallest = data
+            if len(data) <= target_size:
+                return data, ext
+            
+            # 缩小尺寸后重试
+            new_size = (int(work.width * cls.TARGET_RESIZE_STEP),
+                        int(work.height * cls.TARGET_RESIZE_STEP))
+            if min(new_size) < cls.TARGET_MIN_SIDE:
+                logging.warning(f"无法压缩到 {target_size} 字节以内，返回最小结果 {len(smallest)} 字节")
+                return smallest, ext
+            work = base.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    
+    @classmethod
+    def _use_auto_quality(cls, mode: str, quality_override: int, ssim_threshold: float) -> bool:
+        return (mode == cls.MODE_VISUALLY_LOSSLESS and quality_override is None
+                and ssim_threshold is not None)
+    
+    @classmethod
+    def _auto_quality(cls, img: Image.Image, encode, threshold: float, report: dict = None) -> bytes:
+        """
+        按 SSIM 自动选择质量：二分查找评分不低于阈值的最低质量
+        
+        评分在缩小后的亮度通道上计算，参考图只计算一次
+        """
+        img.load()
+        reference = luma_plane(img)
+        scores = {}
+        
+        def accept(quality, data):
+            scores[quality] = ssim_of_encoded(reference, data)
+            return scores[quality] >= threshold
+        
+        quality, data = cls._bisect_quality(
+            lambda q: encode(img, q), accept,
+            cls.AUTO_MIN_QUALITY, cls.AUTO_MAX_QUALITY, lowest=True
+        )
+        
+        if report is not None:
+            report["quality"] = quality
+            report["ssim"] = round(scores[quality], 4)
+        return data
+    
+    @staticmethod
+    def _bisect_quality(encode, accept, low: int, high: int, lowest: bool = False) -> tuple:
+        """
+        二分查找满足条件的质量
+        
+        Args:
+            encode: quality -> bytes
+            accept: (quality, bytes) -> bool，随质量单调变化
+            low/high: 质量搜索范围
+            lowest: True 时查找满足条件的最低质量（accept 随质量升高由假变真），
+                    否则查找最高质量（accept 随质量升高由真变假）
+            
+        Returns:
+            (quality, data)，都不满足时返回最接近满足条件的一端
+        """
+        best = None
+        fallback = None
+        while low <= high:
+            mid = (low + high) // 2
+            data = encode(mid)
+            if accept(mid, data):
+                best = (mid, data)
+                if lowest:
+                    high = mid - 1
+                else:
+                    low = mid + 1
+            else:
+                if fallback is None or (mid > fallback[0] if lowest else mid < fallback[0]):
+                    fallback = (mid, data)
+                if lowest:
+                    low = mid + 1
+                else:
+                    high = mid - 1
+        return best or fallback
+
+
+def compress_file(file_path: str, settings: dict, cache_dir: str = None,
+                  spool_dir: str = None) -> dict:
+    """
+    压缩单个图片文件
+    
+    Args:
+        file_path: 图片路径
+        settings: 压缩设置 {"mode", "quality", "resize", "fit", "target_size",
+                  "ssim_threshold", "png_colors", "png_dither", "effort",
+                  "allow_format_change", "budget_mp", "png_exhaustive"}
+        cache_dir: 结果缓存目录，为 None 时不使用缓存
+        spool_dir: 暂存目录；指定时结果写入该目录，返回 "path" 而不是 "data"
+        
+    Returns:
+        结果字典（含压缩后的数据或暂存路径，以及实际使用的质量 / SSIM 评分）
+    """
+    cache = ResultCache(cache_dir) if cache_dir else None
+    cache_key = None
+    
+    if cache is not None:
+        cache_key = ResultCache.make_key(file_digest(file_path), settings)
+        hit = cache.get_path(cache_key)
+        if hit is not None:
+            # 命中缓存：内容相同则结果相同，只需按当前文件名生成输出名
+            data_path, meta = hit
+            ext = Path(meta["output_name"]).suffix
+            result = dict(meta)
+            result.update({
+                "file": file_path,
+                "output_name": Path(file_path).stem + "_compressed" + ext,
+                "cached": True,
+                "encode_time": 0.0
+            })
+            try:
+                if spool_dir:
+                    result["path"] = spool_copy(spool_dir, data_path, ext)
+                else:
+                    with open(data_path, 'rb') as f:
+                        result["data"] = f.read()
+                return result
+            except OSError:
+                # 缓存文件刚被淘汰等情况，重新压缩
+                pass
+    
+    result = _compress_file(file_path, settings)
+    
+    if cache is not None:
+        meta = {k: v for k, v in result.items() if k not in ("file", "data")}
+        cache.put(cache_key, result["data"], meta)
+    
+    if spool_dir:
+        data = result.pop("data")
+        result["path"] = spool_file(spool_dir, data, Path(result["output_name"]).suffix)
+    return result
+
+
+def output_size(size: tuple, resize_percent: int = 100, fit: tuple = None) -> tuple:
+    """
+    计算输出尺寸：按百分比缩放，并等比缩小到 fit (宽, 高) 以内（不放大）
+    
+    "长边 2048" 即 fit=(2048, 2048)
+    
+    Returns:
+        新尺寸，不需要缩放时返回 None
+    """
+    width, height = size
+    scale = resize_percent / 100
+    if fit:
+        fit_scale = min(fit[0] / width, fit[1] / height)
+        if fit_scale < scale:
+            return max(1, round(width * fit_scale)), max(1, round(height * fit_scale))
+    if scale >= 1:
+        return None
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def _scale_down(img: Image.Image, size: tuple) -> Image.Image:
+    """
+    缩小图片
+    
+    JPEG 先用 draft 让解码器在 DCT 域按 1/2、1/4、1/8 缩小解码；
+    其余格式（以及 draft 之后剩余的大幅缩放）先用 reduce 按整数倍盒式缩小，
+    最后只对不到 REDUCING_GAP 倍的剩余缩放做 LANCZOS，不在全尺寸源图上跑 LANCZOS
+    """
+    if img.format == "JPEG":
+        # draft 只会缩小到不小于 size 的最近比例，必须在加载像素前调用
+        img.draft(img.mode, size)
+    if img.size != size:
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    return img
+
+
+def _compress_file(file_path: str, settings: dict) -> dict:
+    """压缩单个图片文件（不经过缓存）"""
+    mode = settings.get("mode", SmartCompressor.MODE_VISUALLY_LOSSLESS)
+    quality = settings.get("quality")
+    resize_percent = settings.get("resize", 100)
+    fit = settings.get("fit")
+    resizing = resize_percent < 100 or bool(fit)
+    target_size = settings.get("target_size")
+    ssim_threshold = settings.get("ssim_threshold")
+    effort = settings.get("effort", SmartCompressor.EFFORT_MAX)
+    race = settings.get("allow_format_change") and mode not in (
+        SmartCompressor.MODE_LOSSLESS, SmartCompressor.MODE_TARGET_SIZE
+    )
+    
+    original_size = os.path.getsize(file_path)
+    original_ext = Path(file_path).suffix.lower()
+    
+    # 获取原始格式
+    original_format = original_ext.lstrip('.')
+    
+    # 目标大小模式：原文件已满足要求时直接使用，无需解码
+    if (mode == SmartCompressor.MODE_TARGET_SIZE and target_size
+            and original_size <= target_size and not resizing):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        return {
+            "file": file_path,
+            "output_name": Path(file_path).stem + "_compressed" + original_ext,
+            "original_size": original_size,
+            "compressed_size": original_size,
+            "ratio": 0,
+            "success": True,
+            "data": data
+        }
+    
+    # JPEG 缩小时 draft 按比例解码比复用全尺寸缓存更快
+    if resizing and original_format in ('jpg', 'jpeg'):
+        opener = Image.open
+    else:
+        opener = open_image
+    
+    with opener(file_path) as img:
+        # 调整尺寸（如果需要）
+        new_size = output_size(img.size, resize_percent, fit)
+        
+        # 计时包含延迟解码，反映每个文件的实际处理耗时
+        report = {}
+        start = time.perf_counter()
+        if animation.is_animated(img) and original_format in ('gif', 'webp'):
+            # 动画逐帧压缩，避免只保留第一帧
+            compressed_data, ext = SmartCompressor.compress_animation(
+                img, original_format, mode, quality, new_size, report, effort
+            )
+        else:
+            if new_size:
+                img = _scale_down(img, new_size)
+            
+            # 超过像素预算的图片走有界内存路径（目标大小模式仍需逐次完整编码）
+            large = (is_large(img.size, settings.get("budget_mp"))
+                     and mode != SmartCompressor.MODE_TARGET_SIZE)
+            
+            if large:
+                compressed_data, ext = SmartCompressor.compress_large(
+                    img, original_format, mode, quality, ssim_threshold, report, effort
+                )
+            elif race:
+                # 不要求保持格式：多编码器竞争取最小
+                compressed_data, ext = SmartCompressor.compress_smallest(
+                    img, quality, ssim_threshold, report, effort,
+                    png_colors=settings.get("png_colors"),
+                    png_dither=settings.get("png_dither", True),
+                    png_exhaustive=settings.get("png_exhaustive", False),
+                    mode=mode
+                )
+            else:
+                # 压缩（保持原格式）
+                compressed_data, ext = SmartCompressor.compress(
+                    img,
+                    original_format,
+                    mode,
+                    quality,
+                    target_size,
+                    ssim_threshold,
+                    report,
+                    png_colors=settings.get("png_colors"),
+                    png_dither=settings.get("png_dither", True),
+                    effort=effort,
+                    png_exhaustive=settings.get("png_exhaustive", False)
+                )
+        encode_time = time.perf_counter() - start
+        
+        compressed_size = len(compressed_data)
+        
+        # 如果压缩后反而变大，使用原文件
+        if compressed_size >= original_size and new_size is None:
+            with open(file_path, 'rb') as f:
+                compressed_data = f.read()
+            compressed_size = original_size
+            ext = original_ext
+            report = {}
+        
+        output_name = Path(file_path).stem + "_compressed" + ext
+        
+        return {
+            "file": file_path,
+            "output_name": output_name,
+            "original_size": original_size,
+            "compressed_size": compressed_size,
+            "ratio": (1 - compressed_size / original_size) * 100 if original_size > 0 else 0,
+            "success": True,
+            "data": compressed_data,
+            "quality": report.get("quality"),
+            "ssim": report.get("ssim"),
+            "colors": report.get("colors"),
+            "format": report.get("format"),
+            "encode_time": round(encode_time, 3)
+        }
+
+
+def preview_crop(file_path: str, settings: dict, crop_size: tuple) -> dict:
+    """
+    只压缩输出图中心的一块 1:1 区域，并按像素数推算整张图压缩后的大小
+    
+    用于拖动质量滑块时的实时预览，解码结果来自共享缓存，每次只需编码这一小块。
+    为保证响应速度，预览不做 PNG 穷举优化。
+    
+    Args:
+        file_path: 图片路径
+        settings: 压缩设置（同 compress_file）
+        crop_size: 预览区域尺寸（输出图像素）
+        
+    Returns:
+        {"data", "crop_size", "estimated_size", "quality", "format", "encode_time"}，
+        动画图片返回 None
+    """
+    mode = settings.get("mode", SmartCompressor.MODE_VISUALLY_LOSSLESS)
+    quality = settings.get("quality")
+    ssim_threshold = settings.get("ssim_threshold")
+    effort = settings.get("effort", SmartCompressor.EFFORT_MAX)
+    race = settings.get("allow_format_change") and mode not in (
+        SmartCompressor.MODE_LOSSLESS, SmartCompressor.MODE_TARGET_SIZE
+    )
+    original_format = Path(file_path).suffix.lower().lstrip('.')
+    
+    with open_image(file_path) as img:
+        if animation.is_animated(img):
+            return None
+        
+        full_size = output_size(img.size, settings.get("resize", 100),
+                                settings.get("fit")) or img.size
+        scale = full_size[0] / img.width
+        crop_width = max(1, min(crop_size[0], full_size[0]))
+        crop_height = max(1, min(crop_size[1], full_size[1]))
+        
+        # 在原图上取对应区域，缩放后恰好是输出图上的 1:1 像素
+        source_width = min(img.width, max(1, round(crop_width / scale)))
+        source_height = min(img.height, max(1, round(crop_height / scale)))
+        left = (img.width - source_width) // 2
+        top = (img.height - source_height) // 2
+        crop = img.crop((left, top, left + source_width, top + source_height))
+        if crop.size != (crop_width, crop_height):
+            crop = crop.resize((crop_width, crop_height), Image.Resampling.LANCZOS)
+    
+    report = {}
+    start = time.perf_counter()
+    if race:
+        data, ext = SmartCompressor.compress_smallest(
+            crop, quality, ssim_threshold, report, effort,
+            png_colors=settings.get("png_colors"),
+            png_dither=settings.get("png_dither", True),
+            mode=mode
+        )
+    else:
+        data, ext = SmartCompressor.compress(
+            crop, original_format, mode, quality, None, ssim_threshold, report,
+            png_colors=settings.get("png_colors"),
+            png_dither=settings.get("png_dither", True),
+            effort=effort
+        )
+    encode_time = time.perf_counter() - start
+    
+    ratio = (full_size[0] * full_size[1]) / (crop_width * crop_height)
+    return {
+        "data": data,
+        "crop_size": (crop_width, crop_height),
+        "estimated_size": int(len(data) * ratio),
+        "quality": report.get("quality"),
+        "format": report.get("format") or ext.lstrip('.'),
+        "encode_time": round(encode_time, 3)
+    }
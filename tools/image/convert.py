@@ -4,109 +4,180 @@
 - 预览转换效果
 - 批量转换
 - 进度显示
+- 多张图片合并为一个 PDF（逐页写入，不同时持有所有解码后的图片）
+- 多进程并行转换，结果按列表顺序送达界面，可在文件之间停止
 """
 import os
-import io
+import time
 import logging
+from functools import partial
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from PIL import Image
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QFrame, QFileDialog, QMessageBox, QProgressBar,
-    QListWidget, QListWidgetItem, QButtonGroup
+    QListWidget, QListWidgetItem, QButtonGroup, QCheckBox, QComboBox
 )
 from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QFont
 
 from ui.workspace import BaseWorkspace, UploadArea
 from ui.image_preview import DualPreviewWidget
+from ui.duplicate_scanner import DuplicateScanner
 from core.config import config
+from tools.image.converter import convert_file
+from tools.image.parallel import run_in_pool, default_workers, resolve_memory_budget
+from tools.image.dedup import output_name_for
+from tools.image.pdf_writer import FIT_CONTAIN, FIT_COVER, assemble_pdf
 
 
 class ConvertWorker(QThread):
-    """转换工作线程"""
+    """
+    转换工作线程
+    
+    结果按 files 的顺序送达（并行时先完成的结果暂存，等待前面的文件）；
+    requestInterruption() 后在处理完当前文件时停止。
+    """
     progress = Signal(int, int)
     file_processed = Signal(str, bytes, dict, str)  # file_path, data, info, output_name
     finished = Signal(list)
     
-    def __init__(self, files: list, target_format: str, output_dir: str = None):
+    # 进度信号的最小间隔（秒），大批量小图标时不会刷屏界面线程
+    PROGRESS_INTERVAL = 0.1
+    
+    def __init__(self, files: list, target_format: str, output_dir: str = None,
+                 parallel: bool = False, max_workers: int = None,
+                 memory_budget: int = None):
         super().__init__()
         self.files = files
         self.target_format = target_format.lower()
         self.output_dir = output_dir
         self.save_files = output_dir is not None
+        self.parallel = parallel
+        self.max_workers = max_workers
+        # 并行时按内存预算准入（字节），为 None 时只按进程数限制
+        self.memory_budget = memory_budget
+        self._last_progress = 0.0
     
     def run(self):
-        results = []
-        total = len(self.files)
-        
-        for i, file_path in enumerate(self.files):
+        if self.parallel and len(self.files) > 1:
+            results = self._run_parallel()
+        else:
+            results = self._run_serial(self.files)
+        self._report_progress(len(results), force=True)
+        self.finished.emit(results)
+    
+    def _run_serial(self, files: list, results: list = None) -> list:
+        results = results if results is not None else []
+        for file_path in files:
+            if self.isInterruptionRequested():
+                break
             try:
                 result = self.convert_image(file_path)
-                results.append(result)
-                
-                if result.get("success") and result.get("data"):
-                    self.file_processed.emit(
-                        file_path,
-                        result["data"],
-                        {"size": len(result["data"]), "name": result["output_name"]},
-                        result["output_name"]
-                    )
             except Exception as e:
                 logging.error(f"转换失败 {file_path}: {e}")
-                results.append({
-                    "file": file_path,
-                    "success": False,
-                    "error": str(e)
-                })
-            
-            self.progress.emit(i + 1, total)
-        
-        self.finished.emit(results)
+                result = self._error_result(file_path, e)
+            results.append(result)
+            self._emit_result(result)
+            self._report_progress(len(results))
+        return results
     
-    def convert_image(self, file_path: str) -> dict:
-        """转换单个图片"""
-        output_name = Path(file_path).stem + f".{self.target_format}"
-        output_buffer = io.BytesIO()
-        
-        with Image.open(file_path) as img:
-            # 处理透明通道
-            if self.target_format in ['jpg', 'jpeg', 'pdf']:
-                if img.mode in ('RGBA', 'P', 'LA'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-            
-            # 保存到缓冲区
-            if self.target_format == 'ico':
-                sizes = [(256, 256), (128, 128), (64, 64), (48, 48), (32, 32), (16, 16)]
-                img.save(output_buffer, format='ICO', sizes=sizes)
-            elif self.target_format == 'pdf':
-                img.save(output_buffer, 'PDF', resolution=100.0)
-            else:
-                save_format = 'JPEG' if self.target_format in ['jpg', 'jpeg'] else self.target_format.upper()
-                img.save(output_buffer, save_format, quality=95)
-        
-        data = output_buffer.getvalue()
-        
-        # 如果需要保存
-        output_path = None
-        if self.save_files and self.output_dir:
-            output_path = os.path.join(self.output_dir, output_name)
-            with open(output_path, 'wb') as f:
-                f.write(data)
-        
+    def _run_parallel(self) -> list:
+        """多进程并行转换，结果按输入顺序返回"""
+        results = []
+        output_dir = self.output_dir if self.save_files else None
+        task = partial(convert_file, target_format=self.target_format, output_dir=output_dir)
+        
+        logging.info(f"并行转换 {len(self.files)} 个文件, 进程数: {self.max_workers or default_workers()}")
+        
+        try:
+            for file_path, result, error in run_in_pool(
+                task, self.files, self.max_workers,
+                memory_budget=self.memory_budget, ordered=True
+            ):
+                if isinstance(error, BrokenProcessPool):
+                    # 进程池已崩溃：从这个文件起（含之后所有在途的文件）都没有真正处理过
+                    logging.warning(f"进程池异常终止，从 {file_path} 起回退到单线程: {error}")
+                    break
+                if error is not None:
+                    logging.error(f"转换失败 {file_path}: {error}")
+                    result = self._error_result(file_path, error)
+                results.append(result)
+                self._emit_result(result)
+                self._report_progress(len(results))
+                # 跳出循环时进程池取消尚未开始的任务
+                if self.isInterruptionRequested():
+                    break
+        except Exception as e:
+            # 进程池无法启动等情况，剩余文件回退到单线程处理
+            logging.warning(f"并行转换不可用，回退到单线程: {e}")
+        
+        # 结果按输入顺序送达，results 恰好对应 files 的前缀，从第一个未处理的文件续上
+        if len(results) < len(self.files) and not self.isInterruptionRequested():
+            self._run_serial(self.files[len(results):], results)
+        
+        return results
+    
+    def _emit_result(self, result: dict):
+        if result.get("success") and result.get("data"):
+            self.file_processed.emit(
+                result["file"],
+                result["data"],
+                {"size": len(result["data"]), "name": result["output_name"]},
+                result["output_name"]
+            )
+    
+    def _report_progress(self, done: int, force: bool = False):
+        """按固定频率发送进度，最后一次总是发送"""
+        now = time.monotonic()
+        if force or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress.emit(done, len(self.files))
+    
+    @staticmethod
+    def _error_result(file_path: str, error: Exception) -> dict:
         return {
             "file": file_path,
-            "output": output_path,
-            "output_name": output_name,
-            "success": True,
-            "data": data
+            "success": False,
+            "error": str(error)
         }
+    
+    def convert_image(self, file_path: str) -> dict:
+        """转换单个图片"""
+        output_dir = self.output_dir if self.save_files else None
+        return convert_file(file_path, self.target_format, output_dir)
+
+
+class PdfAssembleWorker(QThread):
+    """合并为一个 PDF 的工作线程（逐页写入目标文件）"""
+    progress = Signal(int, int)
+    finished = Signal(dict)  # {"output", "pages", "failed"}
+    
+    def __init__(self, files: list, output_path: str, page_size: str = "auto",
+                 fit: str = FIT_CONTAIN):
+        super().__init__()
+        self.files = files
+        self.output_path = output_path
+        self.page_size = page_size
+        self.fit = fit
+    
+    def run(self):
+        total = len(self.files)
+        failed = []
+        try:
+            pages = assemble_pdf(self.files, self.output_path, self.page_size, self.fit)
+            for i, (file_path, error) in enumerate(pages):
+                if error is not None:
+                    failed.append(file_path)
+                self.progress.emit(i + 1, total)
+        except Exception as e:
+            logging.error(f"合并 PDF 失败 {self.output_path}: {e}")
+            self.finished.emit({"output": None, "pages": 0, "failed": self.files,
+                                "error": str(e)})
+            return
+        pages = total - len(failed)
+        self.finished.emit({"output": self.output_path if pages else None,
+                            "pages": pages, "failed": failed})
 
 
 class ImageConvertPage(BaseWorkspace):
@@ -127,6 +198,11 @@ class ImageConvertPage(BaseWorkspace):
         self.current_file_index = 0
         self.processed_results = {}
         self.selected_format = 'WEBP'
+        # 进行中的批量转换（预览使用单独的 worker）
+        self.convert_worker = None
+        # 字节相同的输入只转换一次
+        self.duplicate_scanner = DuplicateScanner(self)
+        self.duplicate_scanner.duplicates_found.connect(self.on_duplicates_found)
         self.setup_convert_ui()
     
     def setup_convert_ui(self):
@@ -208,6 +284,44 @@ class ImageConvertPage(BaseWorkspace):
         
         settings_layout.addWidget(formats_widget)
         
+        # PDF 合并选项（选中 PDF 时显示）
+        self.pdf_options = QWidget()
+        pdf_layout = QVBoxLayout(self.pdf_options)
+        pdf_layout.setContentsMargins(0, 0, 0, 0)
+        pdf_layout.setSpacing(8)
+        
+        self.combine_pdf_check = QCheckBox("合并为一个 PDF")
+        self.combine_pdf_check.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        self.combine_pdf_check.setToolTip("按列表顺序每张图片一页，逐页写入目标文件")
+        pdf_layout.addWidget(self.combine_pdf_check)
+        
+        page_row = QHBoxLayout()
+        page_label = QLabel("页面:")
+        page_label.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        page_row.addWidget(page_label)
+        self.page_size_combo = QComboBox()
+        self.page_size_combo.addItem("按图片尺寸", "auto")
+        self.page_size_combo.addItem("A4", "a4")
+        self.page_size_combo.addItem("Letter", "letter")
+        page_row.addWidget(self.page_size_combo, 1)
+        self.page_fit_combo = QComboBox()
+        self.page_fit_combo.addItem("适应", FIT_CONTAIN)
+        self.page_fit_combo.addItem("填充", FIT_COVER)
+        self.page_fit_combo.setEnabled(False)
+        page_row.addWidget(self.page_fit_combo, 1)
+        pdf_layout.addLayout(page_row)
+        self.page_size_combo.currentIndexChanged.connect(
+            lambda: self.page_fit_combo.setEnabled(self.page_size_combo.currentData() != "auto")
+        )
+        
+        self.pdf_options.setVisible(False)
+        settings_layout.addWidget(self.pdf_options)
+        
+        self.parallel_check = QCheckBox(f"多核并行处理 ({default_workers()} 核)")
+        self.parallel_check.setStyleSheet("color: #cbd5e1; font-size: 12px;")
+        self.parallel_check.setChecked(default_workers() > 1)
+        settings_layout.addWidget(self.parallel_check)
+        
         # 文件列表
         files_header = QHBoxLayout()
         files_label = QLabel("待转换文件")
@@ -239,6 +353,13 @@ class ImageConvertPage(BaseWorkspace):
         self.progress_bar.setVisible(False)
         settings_layout.addWidget(self.progress_bar)
         
+        # 停止按钮（批量转换时显示，处理完当前文件后停止）
+        self.stop_btn = QPushButton("⏹ 停止")
+        self.stop_btn.setObjectName("secondary_btn")
+        self.stop_btn.setVisible(False)
+        self.stop_btn.clicked.connect(self.stop_convert)
+        settings_layout.addWidget(self.stop_btn)
+        
         # 预览按钮
         self.preview_btn = QPushButton("👁️ 预览效果")
         self.preview_btn.setObjectName("secondary_btn")
@@ -263,17 +384,17 @@ class ImageConvertPage(BaseWorkspace):
         self.selected_format = fmt
         for f, btn in self.format_buttons.items():
             btn.setChecked(f == fmt)
+        self.pdf_options.setVisible(fmt == 'PDF')
     
     def on_files_added(self, files: list):
         """文件添加"""
         valid_extensions = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')
-        for file_path in files:
-            if file_path.lower().endswith(valid_extensions):
-                if file_path not in self.files:
-                    self.files.append(file_path)
-                    item = QListWidgetItem(f"📷 {Path(file_path).name}")
-                    item.setData(Qt.ItemDataRole.UserRole, file_path)
-                    self.files_list.addItem(item)
+        valid = [f for f in files if f.lower().endswith(valid_extensions)]
+        for file_path in self.duplicate_scanner.add(valid):
+            self.files.append(file_path)
+            item = QListWidgetItem(f"📷 {Path(file_path).name}")
+            item.setData(Qt.ItemDataRole.UserRole, file_path)
+            self.files_list.addItem(item)
         
         self.files_count.setText(str(len(self.files)))
         
@@ -284,6 +405,24 @@ class ImageConvertPage(BaseWorkspace):
         
         logging.info(f"添加了 {len(files)} 个文件用于转换")
     
+    def on_duplicates_found(self, found: dict):
+        """标记与已添加文件内容相同的文件，已有结果的直接复用"""
+        for file_path, original in found.items():
+            item = self.files_list.item(self.files.index(file_path))
+            item.setText(f"{item.text()} · 与 {Path(original).name} 相同")
+            item.setToolTip(f"{file_path}\n内容与 {original} 相同，批量转换时复用其结果")
+            if original in self.processed_results:
+                self.share_result(original, file_path)
+        logging.info(f"发现 {len(found)} 个重复文件，批量转换时将跳过")
+    
+    def share_result(self, original: str, file_path: str):
+        """把原文件的转换结果复制给内容相同的文件"""
+        result = self.processed_results[original]
+        self.processed_results[file_path] = {
+            "data": result["data"],
+            "output_name": output_name_for(file_path, original, result["output_name"])
+        }
+    
     def on_file_clicked(self, item: QListWidgetItem):
         """文件点击"""
         file_path = item.data(Qt.ItemDataRole.UserRole)
@@ -300,6 +439,7 @@ class ImageConvertPage(BaseWorkspace):
     
     def clear_files(self):
         """清空文件"""
+        self.duplicate_scanner.clear()
         self.files.clear()
         self.files_list.clear()
         self.files_count.setText("0")
@@ -337,18 +477,79 @@ class ImageConvertPage(BaseWorkspace):
             QMessageBox.warning(self, "提示", "请先添加要转换的图片文件")
             return
         
+        if self.selected_format == 'PDF' and self.combine_pdf_check.isChecked():
+            self.start_combine_pdf()
+            return
+        
+        files = self.duplicate_scanner.unique(self.files)
+        if len(files) < len(self.files):
+            logging.info(f"跳过 {len(self.files) - len(files)} 个重复文件，复用相同内容的转换结果")
+        
         self.convert_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         
-        self.worker = ConvertWorker(self.files, self.selected_format, None)
+        self.stop_btn.setEnabled(True)
+        self.stop_btn.setVisible(True)
+        
+        self.worker = ConvertWorker(
+            files, self.selected_format, None,
+            parallel=self.parallel_check.isChecked(),
+            memory_budget=resolve_memory_budget(config.get("parallel_memory_budget_mb", 0))
+        )
         self.worker.progress.connect(self.on_progress)
         self.worker.file_processed.connect(self.on_file_processed)
         self.worker.finished.connect(self.on_convert_finished)
+        self.convert_worker = self.worker
         self.worker.start()
         
         logging.info(f"开始转换 {len(self.files)} 个文件为 {self.selected_format}")
     
+    def start_combine_pdf(self):
+        """按列表顺序把所有图片合并为一个 PDF"""
+        default_path = os.path.join(config.get_output_directory(), "images.pdf")
+        output_path, _ = QFileDialog.getSaveFileName(
+            self, "保存合并的 PDF", default_path, "PDF 文件 (*.pdf)"
+        )
+        if not output_path:
+            return
+        
+        self.convert_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        
+        self.worker = PdfAssembleWorker(
+            list(self.files), output_path,
+            self.page_size_combo.currentData(), self.page_fit_combo.currentData()
+        )
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_combine_finished)
+        self.worker.start()
+        
+        logging.info(f"开始合并 {len(self.files)} 张图片为 PDF: {output_path}")
+    
+    def on_combine_finished(self, result: dict):
+        """PDF 合并完成"""
+        self.convert_btn.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        
+        if not result["output"]:
+            QMessageBox.warning(self, "合并失败", result.get("error") or "没有可写入的页面")
+            return
+        
+        msg = f"已合并 {result['pages']} 页到:\n{result['output']}"
+        if result["failed"]:
+            msg += f"\n\n❌ 失败: {len(result['failed'])} 个（已跳过）"
+        QMessageBox.information(self, "合并完成", msg)
+        logging.info(f"PDF 合并完成: {result['pages']} 页, 失败 {len(result['failed'])}")
+    
+    def stop_convert(self):
+        """停止批量转换（已完成的结果保留）"""
+        if self.convert_worker is not None and self.convert_worker.isRunning():
+            self.stop_btn.setEnabled(False)
+            self.convert_worker.requestInterruption()
+            logging.info("正在停止转换...")
+    
     def on_progress(self, current: int, total: int):
         """进度更新"""
         self.progress_bar.setValue(int(current / total * 100))
@@ -359,18 +560,33 @@ class ImageConvertPage(BaseWorkspace):
             "data": data,
             "output_name": output_name
         }
+        for copy_path in self.duplicate_scanner.copies_of(file_path):
+            self.share_result(file_path, copy_path)
         
-        if self.files.index(file_path) == self.current_file_index:
+        current = self.files[self.current_file_index]
+        if current == file_path or self.duplicate_scanner.original_of(current) == file_path:
+            output_name = self.processed_results[current]["output_name"]
             self.preview_widget.set_result(data, info, output_name, show_size_compare=False)
     
     def on_convert_finished(self, results: list):
         """转换完成"""
         self.convert_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
+        self.stop_btn.setVisible(False)
         
         success_count = sum(1 for r in results if r.get("success"))
         
-        msg = f"转换完成!\n\n✅ 成功: {success_count}/{len(results)}\n\n请点击「批量保存」或在预览中单独保存"
+        copies = sum(len(self.duplicate_scanner.copies_of(r["file"]))
+                     for r in results if r.get("success"))
+        
+        total = len(self.convert_worker.files)
+        if len(results) < total:
+            msg = f"转换已停止\n\n⏹ 已处理: {len(results)}/{total}\n✅ 成功: {success_count}\n"
+        else:
+            msg = f"转换完成!\n\n✅ 成功: {success_count}/{len(results)}\n"
+        if copies:
+            msg += f"🔁 重复文件: {copies} 个（已复用结果）\n"
+        msg += "\n请点击「批量保存」或在预览中单独保存"
         QMessageBox.information(self, "转换结果", msg)
         logging.info(f"转换完成: 成功 {success_count}/{len(results)}")
     
@@ -0,0 +1,143 @@
+"""
+图片格式转换引擎
+- 不依赖 Qt，可在子进程 / 命令行中直接调用
+- convert_file: 单文件转换任务（可被进程池调度）
+- JPEG 转 PDF 时直接嵌入原始 JPEG 字节流（DCTDecode），不解码也不重新编码
+"""
+import os
+import io
+from pathlib import Path
+from PIL import Image
+
+from tools.image.decoded_cache import open_image
+from tools.image.ico_writer import build_ico
+
+try:
+    # 新版 PyMuPDF 的模块名（旧名 fitz 会向标准输出打印弃用警告）
+    import pymupdf as fitz
+    HAS_PYMUPDF = True
+except ImportError:
+    try:
+        import fitz
+        HAS_PYMUPDF = True
+    except ImportError:
+        HAS_PYMUPDF = False
+
+
+# 支持的目标格式
+TARGET_FORMATS = ('jpg', 'jpeg', 'png', 'webp', 'ico', 'pdf')
+
+# 图片没有记录 DPI 时 PDF 页面使用的分辨率
+PDF_DEFAULT_DPI = 100.0
+# PDF 可直接嵌入的 JPEG 颜色模式（CMYK JPEG 常见反相问题，仍走重新编码）
+PDF_PASSTHROUGH_MODES = ('RGB', 'L')
+
+
+def convert_file(file_path: str, target_format: str, output_dir: str = None) -> dict:
+    """
+    转换单个图片
+    
+    Args:
+        file_path: 图片路径
+        target_format: 目标格式（jpg/png/webp/ico/pdf）
+        output_dir: 输出目录，为 None 时只返回数据不写文件
+    
+    Returns:
+        结果字典（含转换后的数据）
+    """
+    target_format = target_format.lower()
+    output_name = Path(file_path).stem + f".{target_format}"
+    
+    data = None
+    if target_format == 'pdf':
+        data = jpeg_to_pdf(file_path)
+    if data is None:
+        data = _encode(file_path, target_format)
+    
+    # 如果需要保存
+    output_path = None
+    if output_dir:
+        output_path = os.path.join(output_dir, output_name)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    
+    return {
+        "file": file_path,
+        "output": output_path,
+        "output_name": output_name,
+        "success": True,
+        "data": data
+    }
+
+
+def pdf_dpi(img: Image.Image) -> tuple:
+    """图片记录的 DPI，没有或无效时为 PDF_DEFAULT_DPI"""
+    dpi = img.info.get("dpi")
+    try:
+        x_dpi, y_dpi = (float(v) for v in dpi)
+    except (TypeError, ValueError):
+        x_dpi = y_dpi = 0
+    if x_dpi <= 0 or y_dpi <= 0:
+        x_dpi = y_dpi = PDF_DEFAULT_DPI
+    return x_dpi, y_dpi
+
+
+def pdf_page_size(img: Image.Image) -> tuple:
+    """按图片的 DPI 计算 PDF 页面尺寸（磅）"""
+    x_dpi, y_dpi = pdf_dpi(img)
+    return img.width * 72 / x_dpi, img.height * 72 / y_dpi
+
+
+def jpeg_to_pdf(file_path: str) -> bytes:
+    """
+    把 JPEG 原样嵌入单页 PDF（DCTDecode），耗时接近复制文件
+    
+    Returns:
+        PDF 数据；不是可直接嵌入的 JPEG 或没有 PyMuPDF 时返回 None
+    """
+    if not HAS_PYMUPDF:
+        return None
+    # 只读取文件头，不解码像素
+    with Image.open(file_path) as img:
+        if img.format != 'JPEG' or img.mode not in PDF_PASSTHROUGH_MODES:
+            return None
+        width, height = pdf_page_size(img)
+    
+    with open(file_path, 'rb') as f:
+        stream = f.read()
+    doc = fitz.open()
+    try:
+        page = doc.new_page(width=width, height=height)
+        page.insert_image(page.rect, stream=stream)
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def _encode(file_path: str, target_format: str) -> bytes:
+    """解码后用 Pillow 重新编码为目标格式"""
+    output_buffer = io.BytesIO()
+    with open_image(file_path) as img:
+        # 页面尺寸与 JPEG 直接嵌入及合并 PDF 一致（处理透明通道后 info 会丢失，先取出）
+        dpi = pdf_dpi(img)
+        
+        # 处理透明通道
+        if target_format in ['jpg', 'jpeg', 'pdf']:
+            if img.mode in ('RGBA', 'P', 'LA'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+        
+        # 保存到缓冲区
+        if target_format == 'ico':
+            output_buffer.write(build_ico(img))
+        elif target_format == 'pdf':
+            img.save(output_buffer, 'PDF', dpi=dpi)
+        else:
+            save_format = 'JPEG' if target_format in ['jpg', 'jpeg'] else target_format.upper()
+            img.save(output_buffer, save_format, quality=95)
+    return output_buffer.getvalue()
@@ -0,0 +1,111 @@
+"""
+解码图片的内存缓存
+- 预览时调整质量 / 水印参数只需重新编码，不必重新读取和解码源文件
+- 以 路径 + 修改时间 + 文件大小 为键，按解码后的字节数做 LRU 淘汰
+- 进程内共享、线程安全；取出的是副本，调用方可以随意修改
+- 默认关闭（上限为 0），由界面进程启用，进程池子进程和命令行不占用额外内存
+- 超过大图像素预算的图片不缓存，保持延迟解码，交给有界内存路径（draft / 分块）处理
+- 不依赖 Qt
+"""
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+from tools.image import animation
+
+
+class DecodedImageCache:
+    """按字节数限制的解码图片 LRU"""
+
+    def __init__(self, max_bytes: int = 0, max_pixels: int = 0):
+        self.max_bytes = max_bytes
+        # 可缓存图片的最大像素数（与大图像素预算一致），0 表示不限制
+        self.max_pixels = max_pixels
+        self._entries = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_bytes(img: Image.Image) -> int:
+        """估算解码后的内存占用（Pillow 的多通道模式按每像素 4 字节存储）"""
+        if img.mode in ('1', 'L', 'P'):
+            pixel_size = 1
+        elif img.mode.startswith('I;16'):
+            pixel_size = 2
+        else:
+            pixel_size = 4
+        return img.width * img.height * pixel_size
+
+    @staticmethod
+    def _key(file_path: str) -> tuple:
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
+
+    def open(self, file_path: str) -> Image.Image:
+        """
+        打开图片：命中时返回解码结果的副本，未命中时解码并放入缓存
+
+        未启用、动画图片、超过上限或超过像素预算的图片直接返回 Image.open 的结果
+        （未解码，调用方仍可使用 draft 和有界内存路径）。
+        """
+        if self.max_bytes <= 0:
+            return Image.open(file_path)
+
+        key = self._key(file_path)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+        if cached is not None:
+            return self._clone(cached)
+
+        img = Image.open(file_path)
+        if (animation.is_animated(img) or self.image_bytes(img) > self.max_bytes
+                or (self.max_pixels and img.width * img.height > self.max_pixels)):
+            return img
+
+        img.load()
+        self._put(key, img)
+        return self._clone(img)
+
+    @staticmethod
+    def _clone(img: Image.Image) -> Image.Image:
+        clone = img.copy()
+        # copy() 不保留格式名，压缩引擎按格式选择解码 / 编码策略
+        clone.format = img.format
+        return clone
+
+    def _put(self, key: tuple, img: Image.Image):
+        size = self.image_bytes(img)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= self.image_bytes(old)
+            self._entries[key] = img
+            self._total += size
+            while self._total > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= self.image_bytes(evicted)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+
+# 进程内共享实例
+decoded_images = DecodedImageCache()
+
+
+def open_image(file_path: str) -> Image.Image:
+    """通过共享缓存打开图片"""
+    return decoded_images.open(file_path)
@@ -0,0 +1,147 @@
+"""
+输入文件去重
+- 同一路径重复添加直接忽略（集合查找，不再逐个比较列表）
+- 不同路径但字节完全相同的文件（如从不同文件夹拖入同一张图）只处理一次，
+  结果复制给其余文件
+- 先按文件大小预筛，只有大小相同的文件才需要计算内容哈希
+- 哈希计算由调用方放到后台线程执行
+- 不依赖 Qt
+"""
+import os
+import logging
+from pathlib import Path
+
+from tools.image.result_cache import file_digest
+
+
+def normalize_path(file_path: str) -> str:
+    """用于比较的规范化路径（大小写不敏感的系统上统一大小写）"""
+    return os.path.normcase(os.path.abspath(file_path))
+
+
+def output_name_for(copy_path: str, source_path: str, output_name: str) -> str:
+    """
+    由源文件的输出文件名推出重复文件的输出文件名
+
+    例如 a.png 的输出为 a_compressed.webp，则 b.png 的输出为 b_compressed.webp
+    """
+    source_stem = Path(source_path).stem
+    copy_stem = Path(copy_path).stem
+    if output_name.startswith(source_stem):
+        return copy_stem + output_name[len(source_stem):]
+    return f"{copy_stem}_{output_name}"
+
+
+def hash_files(paths: list):
+    """
+    逐个计算内容哈希，产出 (path, digest)
+
+    读取失败的文件记录日志后跳过（按不重复处理）
+    """
+    for path in paths:
+        try:
+            yield path, file_digest(path)
+        except OSError as e:
+            logging.warning(f"计算文件哈希失败 {path}: {e}")
+
+
+class ContentIndex:
+    """
+    按内容索引已添加的文件
+
+    add() 立即接受新路径，并返回需要计算哈希的文件；
+    哈希结果通过 resolve() 登记，返回该文件与之相同的首个文件。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._known = set()
+        self._by_size = {}
+        self._sizes = {}
+        self._queued = set()
+        self._digests = {}
+        self._by_digest = {}
+        # 重复文件 -> 首个内容相同的文件
+        self.duplicates = {}
+        # 首个文件 -> 与之相同的其余文件
+        self.copies = {}
+
+    def add(self, paths: list) -> tuple:
+        """
+        登记新添加的文件
+
+        Returns:
+            (新接受的路径列表, 需要计算哈希的路径列表)
+        """
+        added = []
+        to_hash = []
+        for path in paths:
+            key = normalize_path(path)
+            if key in self._known:
+                continue
+            self._known.add(key)
+            added.append(path)
+
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            self._sizes[path] = size
+            same_size = self._by_size.setdefault(size, [])
+            same_size.append(path)
+            if len(same_size) > 1:
+                # 大小相同才可能内容相同；先到的文件排在前面，保证它成为首个文件
+                for candidate in same_size:
+                    if candidate not in self._queued:
+                        self._queued.add(candidate)
+                        to_hash.append(candidate)
+        return added, to_hash
+
+    def resolve(self, path: str, digest: str) -> str:
+        """
+        登记文件的内容哈希
+
+        Returns:
+            与之内容相同的首个文件；是首个文件时返回 None
+        """
+        if normalize_path(path) not in self._known:
+            return None
+        self._digests[path] = digest
+        original = self._by_digest.setdefault(digest, path)
+        if original == path:
+            return None
+        self.duplicates[path] = original
+        self.copies.setdefault(original, []).append(path)
+        return original
+
+    def remove(self, paths: list):
+        """移除文件；被移除的首个文件由与之相同的下一个文件接替"""
+        for path in paths:
+            self._known.discard(normalize_path(path))
+            self._queued.discard(path)
+            size = self._sizes.pop(path, None)
+            if size is not None:
+                self._by_size[size].remove(path)
+
+            digest = self._digests.pop(path, None)
+            original = self.duplicates.pop(path, None)
+            if original is not None:
+                self.copies[original].remove(path)
+                if not self.copies[original]:
+                    del self.copies[original]
+            elif path in self.copies:
+                successor, *rest = self.copies.pop(path)
+                del self.duplicates[successor]
+                self._by_digest[digest] = successor
+                if rest:
+                    self.copies[successor] = rest
+                    for copy_path in rest:
+                        self.duplicates[copy_path] = successor
+            elif digest is not None:
+                del self._by_digest[digest]
+
+    def unique(self, paths: list) -> list:
+        """去掉重复文件后的路径列表（保持顺序）"""
+        return [p for p in paths if p not in self.duplicates]
@@ -0,0 +1,94 @@
+"""
+ICO 图标生成
+- 只对源图做一次高质量缩小（到 256），其余尺寸由已生成的较大一级继续缩小，
+  不再每个尺寸都从全尺寸源图重新采样
+- 每个尺寸分别编码为 PNG 和 32 位 BMP，保留较小的一个
+- 手动写出 ICO 目录与图像数据
+- 不依赖 Qt
+"""
+import io
+import struct
+
+import numpy as np
+from PIL import Image
+
+
+# 图标尺寸，从大到小
+ICO_SIZES = (256, 128, 64, 48, 32, 16)
+
+
+def build_ico(img: Image.Image, sizes: tuple = ICO_SIZES) -> bytes:
+    """
+    生成多尺寸 ICO
+
+    非正方形图片保持比例（长边为图标尺寸）；大于源图的尺寸跳过，
+    源图比最小尺寸还小时按源图尺寸生成一个图标。
+
+    Returns:
+        ICO 数据
+    """
+    # 不透明的图片按 RGB / 灰度处理，PNG 不必存 alpha 通道
+    if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+        work = img if img.mode == 'RGBA' else img.convert('RGBA')
+    else:
+        work = img if img.mode in ('RGB', 'L') else img.convert('RGB')
+    longest = max(work.size)
+    targets = sorted({s for s in sizes if s <= longest}, reverse=True) or [min(longest, 256)]
+
+    levels = []
+    for target in targets:
+        # 优先从至少两倍大的一级缩小（如 32 由 64 得到），否则用上一级；第一级来自源图
+        source = next(
+            (level for level in reversed(levels) if max(level.size) >= target * 2),
+            levels[-1] if levels else work
+        )
+        levels.append(_fit(source, target))
+
+    entries = [min(_encode_png(level), _encode_bmp(level), key=len) for level in levels]
+
+    header = struct.pack("<HHH", 0, 1, len(levels))
+    offset = len(header) + 16 * len(levels)
+    directory = []
+    for level, data in zip(levels, entries):
+        width, height = level.size
+        # 宽高字段为 0 表示 256
+        directory.append(struct.pack(
+            "<BBBBHHII", width % 256, height % 256, 0, 0, 1, 32, len(data), offset
+        ))
+        offset += len(data)
+    return header + b"".join(directory) + b"".join(entries)
+
+
+def _fit(img: Image.Image, target: int) -> Image.Image:
+    """等比缩小到长边为 target"""
+    scale = target / max(img.size)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if size == img.size:
+        return img
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def _encode_png(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _encode_bmp(img: Image.Image) -> bytes:
+    """ICO 内的 32 位 BMP：无文件头，高度为两倍（含 AND 掩码），自下而上存储"""
+    width, height = img.size
+    pixels = np.asarray(img.convert('RGBA'), dtype=np.uint8)
+    bgra = pixels[::-1, :, [2, 1, 0, 3]]
+
+    # AND 掩码每行按 4 字节对齐，完全透明的像素置 1（供不支持 alpha 的旧系统使用）
+    transparent = bgra[:, :, 3] == 0
+    row_bytes = (width + 31) // 32 * 4
+    padded = np.zeros((height, row_bytes * 8), dtype=bool)
+    padded[:, :width] = transparent
+    mask = np.packbits(padded, axis=1)
+
+    info = struct.pack(
+        "<IiiHHIIiiII", 40, width, height * 2, 1, 32, 0,
+        bgra.nbytes + mask.nbytes, 0, 0, 0, 0
+    )
+    return info + bgra.tobytes() + mask.tobytes()
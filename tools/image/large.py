@@ -0,0 +1,91 @@
+"""
+超大图片的有界内存处理
+- 像素数超过预算的图片自动走本路径（预算由配置 large_image_budget_mp 控制）
+- Pillow 解码时需要完整的帧缓冲区，本路径保证只保留这一份全尺寸数据：
+  模式转换 / 透明背景合成按条带进行，画质搜索在缩小的代理图上完成，
+  水印只在水印覆盖的区域内合成
+- 不依赖 Qt
+"""
+import math
+from PIL import Image
+
+
+# 默认像素预算（百万像素）
+DEFAULT_BUDGET_MP = 50
+# 每个条带的像素数上限
+STRIP_PIXELS = 4_000_000
+# 代理图的像素数上限（用于画质搜索）
+PROXY_PIXELS = 4_000_000
+
+
+def budget_pixels(budget_mp: float = None) -> int:
+    """把百万像素预算换算为像素数"""
+    return int((budget_mp or DEFAULT_BUDGET_MP) * 1_000_000)
+
+
+def is_large(size: tuple, budget_mp: float = None) -> bool:
+    """图片尺寸是否超过像素预算"""
+    return size[0] * size[1] > budget_pixels(budget_mp)
+
+
+def iter_strips(size: tuple, strip_pixels: int = STRIP_PIXELS):
+    """按行划分条带，产出 (left, top, right, bottom)"""
+    width, height = size
+    rows = max(1, strip_pixels // max(1, width))
+    for top in range(0, height, rows):
+        yield 0, top, width, min(height, top + rows)
+
+
+def flatten_to_rgb(img: Image.Image, background: tuple = (255, 255, 255)) -> Image.Image:
+    """
+    逐条带转为 RGB（透明区域合成到背景色）
+    
+    整图转换会同时产生 RGBA 副本、alpha 通道和 RGB 背景三份全尺寸数据，
+    这里只额外占用一份 RGB 缓冲区和一个条带。
+    """
+    if img.mode == 'RGB':
+        return img
+    
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+    out = Image.new('RGB', img.size, background)
+    for box in iter_strips(img.size):
+        strip = img.crop(box)
+        if has_alpha:
+            strip = strip.convert('RGBA')
+            out.paste(strip, box[:2], strip)
+        else:
+            out.paste(strip.convert('RGB'), box[:2])
+    return out
+
+
+def make_proxy(img: Image.Image, max_pixels: int = PROXY_PIXELS) -> Image.Image:
+    """按整数倍缩小为代理图（盒式平均，只读一遍源数据）"""
+    factor = math.ceil(math.sqrt(img.width * img.height / max_pixels))
+    if factor <= 1:
+        return img
+    return img.reduce(factor)
+
+
+def composite_region(base: Image.Image, layer: Image.Image, dest: tuple):
+    """
+    把小尺寸 RGBA 图层合成到 base 的对应区域（原地修改）
+    
+    只转换并合成图层覆盖的区域，base 可以是 RGB / RGBA / L。
+    """
+    x, y = dest
+    left, top = max(0, x), max(0, y)
+    right = min(base.width, x + layer.width)
+    bottom = min(base.height, y + layer.height)
+    if left >= right or top >= bottom:
+        return
+    
+    if (left, top, right, bottom) != (x, y, x + layer.width, y + layer.height):
+        layer = layer.crop((left - x, top - y, right - x, bottom - y))
+    
+    if base.mode == 'RGBA':
+        base.alpha_composite(layer, (left, top))
+        return
+    
+    region = base.crop((left, top, right, bottom)).convert('RGBA')
+    region.alpha_composite(layer)
+    base.paste(region.convert(base.mode), (left, top))
@@ -0,0 +1,116 @@
+"""
+增量处理清单
+- 记录每个源文件的路径、大小、修改时间、内容哈希、处理设置哈希和输出文件
+- 大小、修改时间、设置都未变且输出文件仍存在时直接跳过，只需 stat，不读取文件
+- 只有修改时间变化时计算内容哈希，内容未变则更新清单后跳过（如文件被 touch 或重新复制）
+- 条目按“处理设置哈希 + 源文件路径”登记，同一输出目录先后转为不同格式时各自保留，互不覆盖
+- 清单保存在输出目录中，先写临时文件再替换
+- 不依赖 Qt
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+from tools.image.dedup import normalize_path
+from tools.image.result_cache import file_digest
+
+
+# 清单格式版本，结构变化时递增（旧清单作废，全部重新处理）
+MANIFEST_VERSION = 2
+MANIFEST_NAME = ".nltools_manifest.json"
+
+
+def settings_digest(settings: dict) -> str:
+    """处理设置的哈希"""
+    raw = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class Manifest:
+    """
+    输出目录的增量处理清单
+
+    用法:
+        manifest = Manifest(output_dir, settings)
+        for path in manifest.stale(files):
+            ...  # 处理后调用 manifest.record(path, output_path)
+        manifest.save()
+    """
+
+    def __init__(self, output_dir: str, settings: dict):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.settings = settings_digest(settings)
+        self.entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取增量清单失败，将全部重新处理: {e}")
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def stale(self, files: list) -> list:
+        """需要（重新）处理的文件，保持顺序"""
+        result = []
+        for path in files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # 交给处理流程报告错误
+                result.append(path)
+                continue
+            entry = self.entries.get(self._key(path))
+            if entry is None or entry["size"] != stat.st_size \
+                    or not os.path.exists(entry["output"]):
+                result.append(path)
+            elif entry["mtime_ns"] != stat.st_mtime_ns:
+                # 只有修改时间变化：按内容判断
+                try:
+                    unchanged = file_digest(path) == entry["digest"]
+                except OSError:
+                    unchanged = False
+                if unchanged:
+                    entry["mtime_ns"] = stat.st_mtime_ns
+                else:
+                    result.append(path)
+        return result
+
+    def record(self, path: str, output_path: str):
+        """登记处理成功的文件"""
+        try:
+            stat = os.stat(path)
+            digest = file_digest(path)
+        except OSError as e:
+            logging.warning(f"登记增量清单失败 {path}: {e}")
+            return
+        self.entries[self._key(path)] = {
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "digest": digest,
+            "settings": self.settings,
+            "output": os.path.abspath(output_path),
+        }
+
+    def _key(self, path: str) -> str:
+        """条目键：处理设置（含目标格式）哈希 + 规范化的源文件路径"""
+        return f"{self.settings}:{normalize_path(path)}"
+
+    def save(self):
+        """写入清单"""
+        data = {"version": MANIFEST_VERSION, "entries": self.entries}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"写入增量清单失败: {e}")
@@ -0,0 +1,174 @@
+"""
+并行任务执行
+- 进程池批量处理（不依赖 Qt）
+- 限制同时在途的任务数，避免一次性提交全部文件
+- 按完成顺序返回结果，或按输入顺序返回（先完成的结果暂存，等待前面的任务）
+- 按内存预算准入：由文件头估算解码后的占用，大图单独运行，小图多个并行
+"""
+import os
+import sys
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from PIL import Image
+
+
+# 处理时的工作内存约为解码后大小的倍数（源图 + 模式转换副本 + 编码缓冲区）
+WORKING_SET_FACTOR = 3
+# 无法读取物理内存大小时使用的默认预算
+FALLBACK_MEMORY_BUDGET = 4 * 1024 ** 3
+
+
+def default_workers() -> int:
+    """默认并行进程数（CPU核心数）"""
+    return max(1, os.cpu_count() or 1)
+
+
+def total_memory() -> int:
+    """物理内存大小（字节），无法获取时返回 None"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+            
+            status = MemoryStatus()
+            status.dwLength = ctypes.sizeof(MemoryStatus)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullTotalPhys
+            return None
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def resolve_memory_budget(budget_mb: int = 0) -> int:
+    """
+    并行任务的内存预算（字节）
+    
+    Args:
+        budget_mb: 配置的预算（MB），为 0 时取物理内存的一半
+    """
+    if budget_mb:
+        return budget_mb * 1024 * 1024
+    total = total_memory()
+    return total // 2 if total else FALLBACK_MEMORY_BUDGET
+
+
+def estimate_footprint(file_path: str) -> int:
+    """
+    由文件头估算处理该图片时的内存占用（字节），不解码像素
+    
+    多通道图片按 Pillow 的每像素 4 字节计算，动画按全部帧计算；
+    无法识别的文件返回 0（任务会很快失败，不占预算）
+    """
+    try:
+        with Image.open(file_path) as img:
+            width, height = img.size
+            bytes_per_pixel = 1 if len(img.getbands()) == 1 else 4
+            frames = getattr(img, "n_frames", 1)
+    except Exception:
+        return 0
+    return width * height * bytes_per_pixel * frames * WORKING_SET_FACTOR
+
+
+def run_in_pool(func, items: list, max_workers: int = None, max_pending: int = None,
+                memory_budget: int = None, footprint=estimate_footprint,
+                ordered: bool = False):
+    """
+    在进程池中执行 func(item)，逐个产出结果
+    
+    Args:
+        func: 模块级函数（或其 functools.partial），需可被 pickle
+        items: 任务参数列表
+        max_workers: 进程数，默认CPU核心数
+        max_pending: 最多同时在途的任务数，默认进程数的2倍
+        memory_budget: 在途任务的内存预算（字节），为 None 时不限制；
+                       超出预算的任务等待，单个任务超出预算时单独运行
+        footprint: 估算单个任务内存占用的函数，默认把 item 视为图片路径
+        ordered: 按输入顺序产出；提前完成的结果暂存，暂存与在途的任务合计
+                 不超过 max_pending，慢任务不会让结果无限堆积
+    
+    Yields:
+        (item, result, error) - 成功时 error 为 None，失败时 result 为 None
+    """
+    max_workers = max_workers or default_workers()
+    max_pending = max_pending or max_workers * 2
+    
+    # 统一使用 spawn，避免在带有 Qt 线程的进程中 fork
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+    
+    pending = {}
+    # 按输入顺序产出时：已完成但前面还有任务未完成的结果
+    ready = {}
+    submitted = 0
+    next_index = 0
+    queue = iter(items)
+    exhausted = False
+    # 已取出但因内存不足尚未提交的任务（按顺序准入，不让大图被小图饿死）
+    waiting = None
+    in_flight = 0
+    
+    try:
+        while True:
+            # 补充任务直到达到在途上限或内存预算
+            while not exhausted:
+                # 按输入顺序产出时，暂存的结果也计入在途上限
+                outstanding = submitted - next_index if ordered else len(pending)
+                if outstanding >= max_pending:
+                    break
+                if waiting is None:
+                    try:
+                        item = next(queue)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    cost = footprint(item) if memory_budget else 0
+                    waiting = (item, cost)
+                
+                item, cost = waiting
+                if memory_budget and pending and in_flight + cost > memory_budget:
+                    break
+                if memory_budget and cost > memory_budget:
+                    logging.info(f"任务预计占用 {cost / 1024 / 1024:.0f} MB，超出内存预算，单独运行: {item}")
+                
+                pending[executor.submit(func, item)] = (submitted, item, cost)
+                submitted += 1
+                in_flight += cost
+                waiting = None
+            
+            if not pending:
+                break
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item, cost = pending.pop(future)
+                in_flight -= cost
+                try:
+                    outcome = (item, future.result(), None)
+                except Exception as e:
+                    outcome = (item, None, e)
+                if not ordered:
+                    yield outcome
+                    continue
+                ready[index] = outcome
+                while next_index in ready:
+                    outcome = ready.pop(next_index)
+                    next_index += 1
+                    yield outcome
+    finally:
+        # 提前结束（如被中断）时取消尚未开始的任务
+        executor.shutdown(wait=True, cancel_futures=True)
+        logging.debug(f"进程池已关闭 (workers={max_workers})")
@@ -0,0 +1,227 @@
+"""
+多图合并为一个 PDF（流式写入）
+- 每处理一张图就把该页写入文件，只记录对象偏移，不在内存中保留之前的页面
+- JPEG（RGB / 灰度）原样嵌入 DCTDecode 数据流，其他图片解码后按 Flate 无损压缩
+- 页面尺寸：按图片 DPI 自动（与单图转 PDF 一致），或 A4 / Letter 固定纸张
+- 固定纸张时按图片方向自动横竖，图片按适应（完整显示）或填充（裁去多余部分）放置
+- 写入临时文件，完成后再替换为目标文件，中途失败不会留下残缺的 PDF
+- 不依赖 Qt
+"""
+import os
+import zlib
+import logging
+
+from PIL import Image
+
+from tools.image.converter import PDF_PASSTHROUGH_MODES, pdf_page_size
+
+
+# 页面尺寸（磅），None 表示按图片尺寸和 DPI
+PAGE_SIZES = {
+    "auto": None,
+    "a4": (595.28, 841.89),
+    "letter": (612.0, 792.0),
+}
+
+# 图片在固定纸张上的放置方式
+FIT_CONTAIN = "fit"     # 完整显示，留白居中
+FIT_COVER = "fill"      # 铺满页面，裁去超出部分
+FIT_MODES = (FIT_CONTAIN, FIT_COVER)
+
+# 固定纸张的页边距（磅）
+PAGE_MARGIN = 18.0
+
+_COLOR_SPACES = {"RGB": b"/DeviceRGB", "L": b"/DeviceGray"}
+
+
+def _image_stream(file_path: str) -> tuple:
+    """
+    读取一张图片的 PDF 图像数据
+
+    Returns:
+        (数据, 滤镜, 颜色模式, (宽, 高), 自动页面尺寸)
+    """
+    with Image.open(file_path) as img:
+        page_size = pdf_page_size(img)
+        if img.format == 'JPEG' and img.mode in PDF_PASSTHROUGH_MODES:
+            mode, size = img.mode, img.size
+            with open(file_path, 'rb') as f:
+                return f.read(), b"/DCTDecode", mode, size, page_size
+
+        # 透明部分铺白底，与单图转 PDF 一致
+        if img.mode in ('RGBA', 'LA', 'P', 'PA'):
+            rgba = img.convert('RGBA')
+            flat = Image.new('RGB', img.size, (255, 255, 255))
+            flat.paste(rgba, mask=rgba.getchannel('A'))
+        elif img.mode in _COLOR_SPACES:
+            flat = img
+        else:
+            flat = img.convert('RGB')
+        data = zlib.compress(flat.tobytes(), 6)
+        return data, b"/FlateDecode", flat.mode, flat.size, page_size
+
+
+def _placement(image_size: tuple, box: tuple, fit: str) -> tuple:
+    """图片在页面内容区域中的位置 (x, y, 宽, 高)"""
+    box_x, box_y, box_w, box_h = box
+    width, height = image_size
+    if fit == FIT_COVER:
+        scale = max(box_w / width, box_h / height)
+    else:
+        scale = min(box_w / width, box_h / height)
+    draw_w, draw_h = width * scale, height * scale
+    return box_x + (box_w - draw_w) / 2, box_y + (box_h - draw_h) / 2, draw_w, draw_h
+
+
+class PdfAssembler:
+    """
+    逐页写入的多页 PDF
+
+    用法:
+        with PdfAssembler(path, page_size="a4") as pdf:
+            for file_path in files:
+                pdf.add_image(file_path)
+    """
+
+    def __init__(self, output_path: str, page_size: str = "auto", fit: str = FIT_CONTAIN):
+        if page_size not in PAGE_SIZES:
+            raise ValueError(f"不支持的页面尺寸: {page_size}")
+        if fit not in FIT_MODES:
+            raise ValueError(f"不支持的放置方式: {fit}")
+        self.output_path = output_path
+        self.page_size = PAGE_SIZES[page_size]
+        self.fit = fit
+        self.pages = 0
+        self._temp_path = output_path + ".part"
+        self._file = open(self._temp_path, 'wb')
+        # 对象编号 -> 文件偏移；1 号为目录，2 号为页面树，最后写入
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_image(self, file_path: str):
+        """把一张图片写为新的一页"""
+        data, image_filter, mode, (width, height), auto_size = _image_stream(file_path)
+
+        if self.page_size is None:
+            page_w, page_h = auto_size
+            x, y, draw_w, draw_h = 0, 0, page_w, page_h
+        else:
+            page_w, page_h = self.page_size
+            # 横向图片用横向纸张
+            if (width > height) != (page_w > page_h):
+                page_w, page_h = page_h, page_w
+            box = (PAGE_MARGIN, PAGE_MARGIN, page_w - 2 * PAGE_MARGIN, page_h - 2 * PAGE_MARGIN)
+            x, y, draw_w, draw_h = _placement((width, height), box, self.fit)
+
+        image_id = self._write_stream(
+            b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace %s /BitsPerComponent 8 /Filter %s"
+            % (width, height, _COLOR_SPACES[mode], image_filter),
+            data
+        )
+
+        content = b"q\n"
+        if self.page_size is not None:
+            # 裁去填充模式下超出内容区域的部分
+            content += b"%s re W n\n" % _numbers(
+                PAGE_MARGIN, PAGE_MARGIN, page_w - 2 * PAGE_MARGIN, page_h - 2 * PAGE_MARGIN
+            )
+        content += b"%s 0 0 %s %s cm /Im0 Do\nQ\n" % (
+            _numbers(draw_w), _numbers(draw_h), _numbers(x, y)
+        )
+        content_id = self._write_stream(b"", content)
+
+        page_id = self._write_object(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (_numbers(page_w, page_h), image_id, content_id)
+        )
+        self._page_ids.append(page_id)
+        self.pages += 1
+
+    def close(self):
+        """写入页面树、目录和交叉引用表，替换为目标文件"""
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._write_object(
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)), 2
+        )
+        self._write_object(b"<< /Type /Catalog /Pages 2 0 R >>", 1)
+
+        xref_offset = self._file.tell()
+        count = self._next_id
+        lines = [b"xref\n0 %d\n" % count, b"0000000000 65535 f \n"]
+        lines += [b"%010d 00000 n \n" % self._offsets[i] for i in range(1, count)]
+        self._file.write(b"".join(lines))
+        self._file.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (count, xref_offset)
+        )
+        self._file.close()
+        os.replace(self._temp_path, self.output_path)
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError as e:
+            logging.warning(f"删除临时文件失败 {self._temp_path}: {e}")
+
+    def _write_object(self, body: bytes, object_id: int = None) -> int:
+        if object_id is None:
+            object_id = self._next_id
+            self._next_id += 1
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+        return object_id
+
+    def _write_stream(self, dictionary: bytes, data: bytes) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n<< %s /Length %d >>\nstream\n"
+                         % (object_id, dictionary, len(data)))
+        self._file.write(data)
+        self._file.write(b"\nendstream\nendobj\n")
+        return object_id
+
+
+def _numbers(*values) -> bytes:
+    return b" ".join(b"%.2f" % v for v in values)
+
+
+def assemble_pdf(files: list, output_path: str, page_size: str = "auto",
+                 fit: str = FIT_CONTAIN):
+    """
+    把多张图片依次写为一个 PDF，每写完一页产出 (path, error)
+
+    读取失败的图片记录日志后跳过；没有任何页面时不生成文件。
+    """
+    pdf = PdfAssembler(output_path, page_size, fit)
+    try:
+        for file_path in files:
+            try:
+                pdf.add_image(file_path)
+            except Exception as e:
+                logging.error(f"添加 PDF 页面失败 {file_path}: {e}")
+                yield file_path, e
+            else:
+                yield file_path, None
+    except BaseException:
+        pdf.abort()
+        raise
+    if pdf.pages:
+        pdf.close()
+    else:
+        pdf.abort()
@@ -0,0 +1,309 @@
+"""
+PNG 穷举优化
+- 先廉价预筛：Pillow 的输出与一次逐行自适应滤波的压缩（均按传入的压缩级别）；
+  图片过大或预筛结果相对 Pillow 的余量不足时直接返回，不做完整穷举
+- 完整穷举时尝试多种行滤波策略 × zlib 策略，保留最小的结果
+  （先以快速压缩初筛滤波结果，只对排名靠前的几种做完整组合）
+- 调色板图片额外尝试调色板重排（透明色在前 / 按频率 / 按亮度），并去掉未使用的颜色
+- 滤波用 numpy 整图向量化计算，zlib 压缩在线程池中并行（zlib 压缩时释放 GIL）；
+  在进程池的工作进程中默认只用一个线程，避免进程数 × 线程数的过度订阅
+- 除 IHDR / PLTE / tRNS / IDAT 外的辅助块（ICC、pHYs 等）沿用 Pillow 的输出
+- 不依赖 Qt
+"""
+import io
+import os
+import zlib
+import multiprocessing
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# 行滤波策略：固定使用 PNG 的 5 种滤波之一，或逐行选择绝对值和最小的滤波
+FILTER_NONE, FILTER_SUB, FILTER_UP, FILTER_AVERAGE, FILTER_PAETH = range(5)
+FILTER_STRATEGIES = {
+    "none": FILTER_NONE,
+    "sub": FILTER_SUB,
+    "up": FILTER_UP,
+    "average": FILTER_AVERAGE,
+    "paeth": FILTER_PAETH,
+    "adaptive": None,
+}
+
+ZLIB_STRATEGIES = {
+    "default": zlib.Z_DEFAULT_STRATEGY,
+    "filtered": zlib.Z_FILTERED,
+    "rle": zlib.Z_RLE,
+}
+
+# 快速初筛后保留的滤波结果数，每个再与全部 zlib 策略组合
+SHORTLIST = 3
+
+# 预筛：自适应滤波比 Pillow 至少小这个比例才值得完整穷举
+SCREEN_HEADROOM = 0.01
+# 超过这个像素数的图片只做预筛（完整穷举的耗时与内存随像素数成倍增加）
+SCREEN_MAX_PIXELS = 4_000_000
+
+# 直接按 8 位通道写出的模式：(每像素字节数, PNG 颜色类型)
+_DIRECT_MODES = {
+    "L": (1, 0),
+    "RGB": (3, 2),
+    "LA": (2, 4),
+    "RGBA": (4, 6),
+}
+
+# 由本模块重新生成的块，其余块沿用 Pillow 的输出（调色板图片的 tRNS 随重排重新生成）
+_REBUILT_CHUNKS = (b"IHDR", b"PLTE", b"IDAT", b"IEND")
+
+
+def optimize_png(img: Image.Image, level: int = 9, max_workers: int = None,
+                 full_search: bool = True) -> bytes:
+    """
+    穷举滤波 / zlib 策略（调色板图片另加调色板重排），返回最小的 PNG
+
+    Pillow 以同一压缩级别保存的结果同样参与比较（级别 9 时加 optimize），因此不会比原来更大。
+    不支持的模式（1 位、16 位等）直接返回 Pillow 的结果。
+    先用自适应滤波做一次完整压缩预筛，图片过大、预筛余量不足 SCREEN_HEADROOM
+    或 full_search 为 False 时返回预筛结果，不做完整穷举。
+
+    Args:
+        img: 要编码的图片
+        level: zlib 压缩级别（预筛与完整穷举都使用，按力度预设传入）
+        max_workers: 压缩线程数，默认CPU核心数；在工作进程中默认 1
+        full_search: 预筛有余量时是否做完整穷举
+
+    Returns:
+        PNG 数据
+    """
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", compress_level=level, optimize=level >= 9)
+    baseline = buffer.getvalue()
+
+    if img.mode == "P":
+        layouts = _palette_layouts(img)
+    elif img.mode in _DIRECT_MODES:
+        layouts = [_direct_layout(img)]
+    else:
+        return baseline
+
+    rebuilt = _REBUILT_CHUNKS + ((b"tRNS",) if img.mode == "P" else ())
+    extra_chunks = [
+        (chunk_type, data) for chunk_type, data in _read_chunks(baseline)
+        if chunk_type not in rebuilt
+    ]
+
+    # 预筛：原始布局 + 自适应滤波，按目标级别完整压缩一次
+    header_chunks, rows, bpp = layouts[0]
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY)
+    filtered = filter_rows(rows, bpp, None)
+    screened = _write_png(header_chunks, extra_chunks,
+                          compressor.compress(filtered) + compressor.flush())
+    best = screened if len(screened) < len(baseline) else baseline
+    if not full_search or img.width * img.height > SCREEN_MAX_PIXELS \
+            or len(screened) > len(baseline) * (1 - SCREEN_HEADROOM):
+        return best
+
+    # 每种布局 × 滤波策略生成一份滤波后的数据
+    variants = [
+        (header_chunks, filter_rows(rows, bpp, filter_strategy))
+        for header_chunks, rows, bpp in layouts
+        for filter_strategy in FILTER_STRATEGIES.values()
+    ]
+
+    def compress(job):
+        header_chunks, filtered, zlib_level, zlib_strategy = job
+        compressor = zlib.compressobj(zlib_level, zlib.DEFLATED, 15, 9, zlib_strategy)
+        return header_chunks, compressor.compress(filtered) + compressor.flush()
+
+    workers = max_workers or default_threads()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 先用快速压缩初筛，只对最有希望的几种滤波结果做完整的策略组合
+        screen = list(executor.map(compress, [
+            (header_chunks, filtered, 1, zlib.Z_DEFAULT_STRATEGY)
+            for header_chunks, filtered in variants
+        ]))
+        ranked = sorted(range(len(variants)), key=lambda i: len(screen[i][1]))
+        jobs = [
+            (*variants[i], level, zlib_strategy)
+            for i in ranked[:SHORTLIST]
+            for zlib_strategy in ZLIB_STRATEGIES.values()
+        ]
+        header_chunks, idat = min(executor.map(compress, jobs), key=lambda r: len(r[1]))
+
+    data = _write_png(header_chunks, extra_chunks, idat)
+    return data if len(data) < len(best) else best
+
+
+def default_threads() -> int:
+    """默认压缩线程数：主进程为CPU核心数，进程池的工作进程中为 1"""
+    if multiprocessing.parent_process() is not None:
+        return 1
+    return os.cpu_count() or 1
+
+
+def filter_rows(rows: np.ndarray, bpp: int, strategy: int = None) -> bytes:
+    """
+    对扫描线做 PNG 行滤波
+
+    Args:
+        rows: (高度, 每行字节数) 的 uint8 数组
+        bpp: 每像素字节数（不足 1 字节按 1 计算）
+        strategy: 固定滤波类型，为 None 时逐行选择绝对值和最小的滤波
+
+    Returns:
+        每行带滤波类型字节的数据
+    """
+    if strategy is None:
+        # 最小绝对值和启发式：把滤波结果视为有符号字节
+        candidates = [_filter(rows, bpp, f) for f in range(5)]
+        costs = np.stack([
+            np.abs(c.view(np.int8).astype(np.int32)).sum(axis=1) for c in candidates
+        ])
+        choice = costs.argmin(axis=0)
+        filtered = np.stack(candidates)[choice, np.arange(rows.shape[0])]
+    else:
+        filtered = _filter(rows, bpp, strategy)
+        choice = np.full(rows.shape[0], strategy)
+
+    out = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    out[:, 0] = choice
+    out[:, 1:] = filtered
+    return out.tobytes()
+
+
+def _filter(rows: np.ndarray, bpp: int, filter_type: int) -> np.ndarray:
+    """整图计算某一种滤波（uint8 运算自动按 256 取模）"""
+    if filter_type == FILTER_NONE:
+        return rows
+
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    up = np.zeros_like(rows)
+    up[1:] = rows[:-1]
+
+    if filter_type == FILTER_SUB:
+        return rows - left
+    if filter_type == FILTER_UP:
+        return rows - up
+    if filter_type == FILTER_AVERAGE:
+        return rows - ((left.astype(np.uint16) + up) >> 1).astype(np.uint8)
+
+    up_left = np.zeros_like(rows)
+    up_left[1:, bpp:] = rows[:-1, :-bpp]
+    a = left.astype(np.int16)
+    b = up.astype(np.int16)
+    c = up_left.astype(np.int16)
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    predictor = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+    return rows - predictor.astype(np.uint8)
+
+
+def _direct_layout(img: Image.Image) -> tuple:
+    bpp, color_type = _DIRECT_MODES[img.mode]
+    rows = np.asarray(img, dtype=np.uint8).reshape(img.height, img.width * bpp)
+    ihdr = struct.pack(">IIBBBBB", img.width, img.height, 8, color_type, 0, 0, 0)
+    return [(b"IHDR", ihdr)], rows, bpp
+
+
+def _palette_layouts(img: Image.Image) -> list:
+    """
+    生成调色板图片的几种重排方案
+
+    - 只保留实际使用的颜色，按颜色数选择 1/2/4/8 位深
+    - 半透明颜色排在最前，tRNS 只需写到最后一个半透明颜色
+    - 其余颜色分别按原顺序 / 出现频率 / 亮度排列，亮度相近的索引相邻时滤波更有效
+    """
+    indices = np.asarray(img, dtype=np.uint8)
+    counts = np.bincount(indices.ravel(), minlength=256)
+    used = [int(i) for i in np.nonzero(counts)[0]]
+
+    palette = img.getpalette() or []
+    palette += [0] * (768 - len(palette))
+    alpha = [255] * 256
+    if img.palette is not None and img.palette.mode == "RGBA":
+        # 量化 RGBA 图片得到的调色板自带 alpha
+        rgba = img.getpalette("RGBA")
+        alpha[:len(rgba) // 4] = rgba[3::4]
+    transparency = img.info.get("transparency")
+    if isinstance(transparency, int):
+        alpha[transparency] = 0
+    elif isinstance(transparency, bytes):
+        alpha[:len(transparency)] = list(transparency)
+
+    def luma(i):
+        r, g, b = palette[i * 3:i * 3 + 3]
+        return 299 * r + 587 * g + 114 * b
+
+    orders = [
+        sorted(used, key=lambda i: alpha[i] == 255),
+        sorted(used, key=lambda i: (alpha[i] == 255, -counts[i])),
+        sorted(used, key=lambda i: (alpha[i] == 255, luma(i))),
+    ]
+
+    bits = next(b for b in (1, 2, 4, 8) if len(used) <= 1 << b)
+    layouts = []
+    for order in orders:
+        lookup = np.zeros(256, dtype=np.uint8)
+        lookup[order] = np.arange(len(order), dtype=np.uint8)
+        rows = _pack_bits(lookup[indices], bits)
+
+        ihdr = struct.pack(">IIBBBBB", img.width, img.height, bits, 3, 0, 0, 0)
+        header_chunks = [
+            (b"IHDR", ihdr),
+            (b"PLTE", bytes(v for i in order for v in palette[i * 3:i * 3 + 3])),
+        ]
+        trns = [alpha[i] for i in order]
+        while trns and trns[-1] == 255:
+            trns.pop()
+        if trns:
+            header_chunks.append((b"tRNS", bytes(trns)))
+        layouts.append((header_chunks, rows, 1))
+    return layouts
+
+
+def _pack_bits(indices: np.ndarray, bits: int) -> np.ndarray:
+    """把每像素一个字节的索引按位深打包为扫描线"""
+    if bits == 8:
+        return indices
+    per_byte = 8 // bits
+    height, width = indices.shape
+    padded_width = -(-width // per_byte) * per_byte
+    padded = np.zeros((height, padded_width), dtype=np.uint8)
+    padded[:, :width] = indices
+    groups = padded.reshape(height, padded_width // per_byte, per_byte)
+    shifts = np.arange(per_byte - 1, -1, -1, dtype=np.uint8) * bits
+    return np.bitwise_or.reduce(groups << shifts, axis=2).astype(np.uint8)
+
+
+def _read_chunks(data: bytes) -> list:
+    """解析 PNG 数据块，返回 [(类型, 数据)]"""
+    chunks = []
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        chunks.append((chunk_type, data[pos + 8:pos + 8 + length]))
+        pos += 12 + length
+    return chunks
+
+
+def _write_png(header_chunks: list, extra_chunks: list, idat: bytes) -> bytes:
+    """按 IHDR、辅助块、PLTE / tRNS、IDAT、IEND 的顺序写出 PNG"""
+    out = io.BytesIO()
+    out.write(PNG_SIGNATURE)
+    for chunk_type, data in header_chunks[:1] + extra_chunks + header_chunks[1:]:
+        _write_chunk(out, chunk_type, data)
+    _write_chunk(out, b"IDAT", idat)
+    _write_chunk(out, b"IEND", b"")
+    return out.getvalue()
+
+
+def _write_chunk(out, chunk_type: bytes, data: bytes):
+    out.write(struct.pack(">I", len(data)))
+    out.write(chunk_type)
+    out.write(data)
+    out.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
@@ -0,0 +1,136 @@
+"""
+图片质量评估
+- 在缩小后的亮度通道上计算 SSIM（NumPy 向量化）
+- 用于自动选择"视觉无损"所需的最低质量
+- 色度细节分析：估计 JPEG 4:2:0 子采样会抹掉多少色度边缘
+"""
+import io
+import math
+import numpy as np
+from PIL import Image, ImageChops
+
+
+# 评估时亮度图的最长边（像素）
+LUMA_MAX_SIDE = 1024
+# SSIM 滑动窗口大小
+SSIM_WINDOW = 7
+
+# 色度分析的像素数上限，超过时按网格截取小块
+CHROMA_MAX_PIXELS = 2_000_000
+CHROMA_TILE = 256
+# 色度残差（Cb/Cr 合成幅度）超过该值的像素视为强色度边缘
+CHROMA_EDGE_LEVEL = 16
+
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def luma_plane(img: Image.Image, size: tuple = None) -> np.ndarray:
+    """
+    获取缩小后的亮度通道
+
+    Args:
+        img: PIL Image对象
+        size: 输出尺寸，默认按 LUMA_MAX_SIDE 等比缩小
+
+    Returns:
+        float64 二维数组
+    """
+    if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+        # 透明区域按白色背景计算，与保存为JPEG时一致
+        rgba = img.convert('RGBA')
+        background = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, rgba)
+    luma = img.convert('L')
+
+    if size is None:
+        size = luma_size(luma.size)
+    if luma.size != size:
+        luma = luma.resize(size, Image.Resampling.BOX)
+    return np.asarray(luma, dtype=np.float64)
+
+
+def luma_size(size: tuple, max_side: int = LUMA_MAX_SIDE) -> tuple:
+    """按最长边限制计算评估尺寸"""
+    width, height = size
+    scale = min(1.0, max_side / max(width, height))
+    return max(SSIM_WINDOW, int(width * scale)), max(SSIM_WINDOW, int(height * scale))
+
+
+def _box_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """积分图实现的滑动窗口均值（仅有效区域）"""
+    c = np.pad(x, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    s = c[window:, window:] - c[:-window, window:] - c[window:, :-window] + c[:-window, :-window]
+    return s / (window * window)
+
+
+def ssim(a: np.ndarray, b: np.ndarray, window: int = SSIM_WINDOW) -> float:
+    """计算两个同尺寸灰度图的平均 SSIM"""
+    if a.shape != b.shape:
+        raise ValueError(f"尺寸不一致: {a.shape} vs {b.shape}")
+
+    mu_a = _box_mean(a, window)
+    mu_b = _box_mean(b, window)
+    # 样本方差/协方差（无偏）
+    norm = window * window / (window * window - 1)
+    var_a = (_box_mean(a * a, window) - mu_a * mu_a) * norm
+    var_b = (_box_mean(b * b, window) - mu_b * mu_b) * norm
+    cov = (_box_mean(a * b, window) - mu_a * mu_b) * norm
+
+    numerator = (2 * mu_a * mu_b + _C1) * (2 * cov + _C2)
+    denominator = (mu_a * mu_a + mu_b * mu_b + _C1) * (var_a + var_b + _C2)
+    return float(np.mean(numerator / denominator))
+
+
+def ssim_of_encoded(reference: np.ndarray, data: bytes) -> float:
+    """将编码结果解码后与参考亮度图比较"""
+    with Image.open(io.BytesIO(data)) as candidate:
+        plane = luma_plane(candidate, (reference.shape[1], reference.shape[0]))
+    return ssim(reference, plane)
+
+
+def chroma_edge_fraction(img: Image.Image) -> float:
+    """
+    估计 4:2:0 子采样会抹掉的强色度边缘占比
+
+    计算 Cb/Cr 与其 2×2 均值的差，即 4:2:0 丢弃的那部分色度。
+    照片的色度残差多为噪声，幅度很小；截图、彩色文字和图形的色度边缘锐利，残差大。
+    超过 CHROMA_MAX_PIXELS 的图片均匀截取若干原尺度的小块拼成缩略图再分析
+    （整体缩小会改变边缘的尺度，使结果偏大）。
+
+    Returns:
+        残差幅度超过 CHROMA_EDGE_LEVEL 的像素比例 (0-1)
+    """
+    sample = _chroma_sample(img)
+    width, height = sample.width // 2 * 2, sample.height // 2 * 2
+    if width == 0 or height == 0:
+        return 0.0
+    if (width, height) != sample.size:
+        # 去掉奇数边，保证 2×2 分块对齐
+        sample = sample.crop((0, 0, width, height))
+
+    residuals = []
+    for channel in sample.convert('YCbCr').split()[1:]:
+        # reduce(2) 即 2×2 均值，放大回原尺寸后与原通道相减
+        smooth = channel.reduce(2).resize(channel.size, Image.Resampling.NEAREST)
+        residuals.append(np.asarray(ImageChops.difference(channel, smooth), dtype=np.int32))
+    magnitude = residuals[0] * residuals[0] + residuals[1] * residuals[1]
+    edges = np.count_nonzero(magnitude > CHROMA_EDGE_LEVEL * CHROMA_EDGE_LEVEL)
+    return edges / magnitude.size
+
+
+def _chroma_sample(img: Image.Image) -> Image.Image:
+    """小图直接返回；大图按网格截取原尺度小块拼成缩略图"""
+    if img.width * img.height <= CHROMA_MAX_PIXELS:
+        return img
+    per_side = max(1, math.isqrt(CHROMA_MAX_PIXELS // (CHROMA_TILE * CHROMA_TILE)))
+    tile_w = min(CHROMA_TILE, img.width // 2 * 2)
+    tile_h = min(CHROMA_TILE, img.height // 2 * 2)
+    # 小块的起点取偶数，保证 2×2 分块与整图对齐
+    xs = [int(x) // 2 * 2 for x in np.linspace(0, img.width - tile_w, per_side)]
+    ys = [int(y) // 2 * 2 for y in np.linspace(0, img.height - tile_h, per_side)]
+    sample = Image.new(img.mode, (tile_w * len(xs), tile_h * len(ys)))
+    for row, y in enumerate(ys):
+        for col, x in enumerate(xs):
+            sample.paste(img.crop((x, y, x + tile_w, y + tile_h)), (col * tile_w, row * tile_h))
+    return sample
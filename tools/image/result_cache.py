@@ -0,0 +1,162 @@
+"""
+压缩结果缓存
+- 以源文件内容哈希 + 完整压缩设置为键，持久化到磁盘
+- 命中时直接读取结果，跳过解码与编码
+- 总大小超过上限时按最近使用时间（LRU）淘汰
+- 不依赖 Qt，可在进程池子进程中使用
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+
+
+# 缓存格式版本，结果文件结构变化时递增
+CACHE_VERSION = 1
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def get_cache_dir() -> Path:
+    """获取默认缓存目录（应用根目录/cache/compress）"""
+    app_root = Path(__file__).parent.parent.parent
+    return app_root / "cache" / "compress"
+
+
+def file_digest(file_path: str) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """磁盘结果缓存"""
+
+    def __init__(self, cache_dir, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(content_digest: str, settings: dict) -> str:
+        """由内容哈希和压缩设置生成缓存键"""
+        settings_str = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+        raw = f"{CACHE_VERSION}:{content_digest}:{settings_str}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> tuple:
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.bin", folder / f"{key}.json"
+
+    def get(self, key: str):
+        """
+        读取缓存
+
+        Returns:
+            (data, meta)，未命中时返回 None
+        """
+        hit = self.get_path(key)
+        if hit is None:
+            return None
+        data_path, meta = hit
+        try:
+            with open(data_path, 'rb') as f:
+                return f.read(), meta
+        except OSError:
+            return None
+
+    def get_path(self, key: str):
+        """
+        查找缓存文件（不读取数据）
+
+        Returns:
+            (data_path, meta)，未命中时返回 None
+        """
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            # 更新修改时间，作为 LRU 的使用时间
+            os.utime(data_path)
+        except (OSError, ValueError):
+            return None
+        return str(data_path), meta
+
+    def put(self, key: str, data: bytes, meta: dict):
+        """写入缓存（先写临时文件再替换，多进程并发写入安全）"""
+        data_path, meta_path = self._paths(key)
+        try:
+            data_path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_atomic(data_path, data)
+            self._write_atomic(
+                meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8')
+            )
+        except OSError as e:
+            logging.warning(f"写入压缩缓存失败: {e}")
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def evict(self) -> int:
+        """
+        按最近使用时间淘汰，直到总大小不超过上限
+
+        Returns:
+            淘汰的条目数
+        """
+        if not self.max_bytes or not self.cache_dir.exists():
+            return 0
+
+        entries = []
+        total = 0
+        for data_path in self.cache_dir.glob("*/*.bin"):
+            try:
+                stat = data_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, data_path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        entries.sort()
+        for _, size, data_path in entries:
+            if total <= self.max_bytes:
+                break
+            for path in (data_path, data_path.with_suffix(".json")):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+
+        logging.info(f"压缩缓存淘汰 {removed} 项，当前 {total / 1024 / 1024:.1f} MB")
+        return removed
+
+    def clear(self):
+        """清空缓存"""
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.glob("*/*"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
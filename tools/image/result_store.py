@@ -0,0 +1,161 @@
+"""
+处理结果暂存
+- 工作进程直接把输出写入临时目录（spool），信号中只传递路径
+- 内存中只保留元数据，需要预览时再从磁盘读取
+- 批量保存时优先硬链接，失败再移动/复制，不重新写入数据
+- 内容相同的源文件可以共用同一个暂存文件，只在没有其他结果引用时才删除
+- 不依赖 Qt
+"""
+import os
+import atexit
+import shutil
+import logging
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+
+def spool_file(spool_dir: str, data: bytes, suffix: str = "") -> str:
+    """把数据写入暂存目录中的新文件，返回文件路径"""
+    fd, path = tempfile.mkstemp(dir=spool_dir, suffix=suffix)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def spool_copy(spool_dir: str, src: str, suffix: str = "") -> str:
+    """
+    把已有文件（如缓存文件）复制到暂存目录
+
+    不使用硬链接，避免导出的文件与缓存共享同一份数据
+    """
+    fd, path = tempfile.mkstemp(dir=spool_dir, suffix=suffix)
+    os.close(fd)
+    shutil.copyfile(src, path)
+    return path
+
+
+class ResultStore:
+    """结果暂存区：file_path -> 元数据（含暂存文件路径）"""
+
+    def __init__(self, prefix: str = "nltools_spool_"):
+        self._prefix = prefix
+        self._spool_dir = None
+        self._results = {}
+        # 暂存文件 -> 引用它的结果数
+        self._refs = Counter()
+        atexit.register(self.cleanup)
+
+    @property
+    def spool_dir(self) -> str:
+        """暂存目录（首次使用时创建）"""
+        if self._spool_dir is None or not os.path.isdir(self._spool_dir):
+            self._spool_dir = tempfile.mkdtemp(prefix=self._prefix)
+        return self._spool_dir
+
+    def add(self, file_path: str, path: str, meta: dict):
+        """登记一个结果，替换同一源文件的旧结果"""
+        old = self._results.get(file_path)
+        if old:
+            self._release(old["path"], discard=old["path"] != path)
+        entry = dict(meta)
+        entry["path"] = path
+        self._results[file_path] = entry
+        self._refs[path] += 1
+
+    def share(self, file_path: str, source: str, **meta):
+        """让内容相同的另一个源文件复用已有结果（共用同一个暂存文件）"""
+        entry = dict(self._results[source])
+        path = entry.pop("path")
+        entry.update(meta)
+        self.add(file_path, path, entry)
+
+    def remove(self, file_path: str):
+        """移除一个结果（暂存文件没有其他结果引用时一并删除）"""
+        entry = self._results.pop(file_path, None)
+        if entry is not None:
+            self._release(entry["path"])
+
+    def read(self, file_path: str) -> bytes:
+        """读取结果数据"""
+        with open(self._results[file_path]["path"], 'rb') as f:
+            return f.read()
+
+    def export(self, file_path: str, dest: str):
+        """
+        把结果保存到目标路径
+
+        优先硬链接（不复制数据）；跨磁盘等无法链接时，
+        暂存中的文件直接移动过去，已导出过的文件则复制
+        """
+        entry = self._results[file_path]
+        src = entry["path"]
+        if os.path.abspath(src) == os.path.abspath(dest):
+            return
+
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(src, dest)
+            return
+        except OSError:
+            pass
+
+        if self._in_spool(src) and self._refs[src] == 1:
+            shutil.move(src, dest)
+            self._release(src, discard=False)
+            entry["path"] = dest
+            self._refs[dest] += 1
+        else:
+            shutil.copyfile(src, dest)
+
+    def _in_spool(self, path: str) -> bool:
+        if self._spool_dir is None:
+            return False
+        return Path(path).resolve().parent == Path(self._spool_dir).resolve()
+
+    def _release(self, path: str, discard: bool = True):
+        """减少引用计数，没有结果再引用时删除暂存文件"""
+        self._refs[path] -= 1
+        if self._refs[path] <= 0:
+            del self._refs[path]
+            if discard:
+                self._discard(path)
+
+    def _discard(self, path: str):
+        if self._in_spool(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __contains__(self, file_path: str) -> bool:
+        return file_path in self._results
+
+    def __getitem__(self, file_path: str) -> dict:
+        return self._results[file_path]
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __bool__(self) -> bool:
+        return bool(self._results)
+
+    def items(self):
+        return self._results.items()
+
+    def clear(self):
+        """清空结果并删除暂存文件"""
+        for path in self._refs:
+            self._discard(path)
+        self._results.clear()
+        self._refs.clear()
+
+    def cleanup(self):
+        """删除整个暂存目录（程序退出时调用）"""
+        self._results.clear()
+        self._refs.clear()
+        if self._spool_dir and os.path.isdir(self._spool_dir):
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+            logging.debug(f"已清理暂存目录: {self._spool_dir}")
+        self._spool_dir = None
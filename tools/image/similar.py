@@ -0,0 +1,212 @@
+"""
+相似图片分组（感知哈希）
+- 对每张图计算 64 位 dHash：缩小为 9×8 灰度图，比较相邻像素的亮度
+- 只做缩小解码：JPEG 用 draft 按 DCT 缩放解码，其他格式先整数倍缩小再转灰度
+- 哈希位运算对整批图片用 numpy 向量化计算
+- 分组用多索引哈希：把 64 位分成 4 段分别排序，汉明距离不超过 d 的两个哈希
+  至少有一段的距离不超过 d // 4，只在各段中查找这些近邻键，不做两两比较
+- 能找出缩放后的副本、重新保存的 JPEG 等内容相同但字节不同的图片
+- 不依赖 Qt
+"""
+import os
+import logging
+from itertools import combinations
+
+import numpy as np
+from PIL import Image
+
+from tools.image.parallel import run_in_pool
+
+
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+# 缩小解码的目标边长（远大于 9×8，保证缩小时的盒式平均足够平滑）
+DECODE_SIZE = HASH_SIZE * 8
+# 默认的汉明距离阈值（64 位中最多有几位不同仍视为相似）
+DEFAULT_MAX_DISTANCE = 6
+# 多索引哈希的分段数（每段 16 位）
+BANDS = 4
+# 每次批量查找的来源哈希数（限制候选对占用的内存）
+PROBE_CHUNK = 4096
+
+
+def hash_pixels(file_path: str) -> tuple:
+    """
+    缩小解码为 (HASH_SIZE, HASH_SIZE + 1) 的灰度像素
+
+    Returns:
+        (像素数组, 原图尺寸)
+    """
+    with Image.open(file_path) as img:
+        size = img.size
+        # JPEG 直接按 1/2、1/4、1/8 缩放解码为灰度
+        img.draft('L', (DECODE_SIZE, DECODE_SIZE))
+        if img.mode in ('1', 'P', 'I', 'F') or img.mode.startswith('I;16'):
+            img = img.convert('L')
+        factor = min(img.width, img.height) // DECODE_SIZE
+        if factor > 1:
+            img = img.reduce(factor)
+        small = img.convert('L').resize(
+            (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX
+        )
+    return np.asarray(small, dtype=np.uint8), size
+
+
+def dhash(pixels: np.ndarray) -> np.ndarray:
+    """
+    批量计算 dHash
+
+    Args:
+        pixels: (N, HASH_SIZE, HASH_SIZE + 1) 的灰度像素
+
+    Returns:
+        (N,) 的 uint64 哈希
+    """
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(pixels), HASH_BITS), axis=1)
+    return packed.view('>u8').ravel().astype(np.uint64)
+
+
+def hamming(hashes: np.ndarray, value) -> np.ndarray:
+    """一组哈希与某个哈希之间的汉明距离"""
+    diff = np.bitwise_xor(hashes, np.uint64(value))
+    return np.unpackbits(diff.view(np.uint8)).reshape(len(hashes), HASH_BITS).sum(axis=1)
+
+
+def hash_images(paths: list, max_workers: int = 1) -> list:
+    """
+    计算一批图片的感知哈希（读取失败的图片记录日志后跳过）
+
+    Args:
+        paths: 图片路径
+        max_workers: 进程数，大于 1 时在进程池中解码
+
+    Returns:
+        [(path, hash, (width, height))]，保持输入顺序
+    """
+    decoded = {}
+    if max_workers > 1 and len(paths) > 1:
+        outcomes = run_in_pool(hash_pixels, paths, max_workers)
+    else:
+        outcomes = _decode_serial(paths)
+    for path, result, error in outcomes:
+        if error is not None:
+            logging.warning(f"计算感知哈希失败 {path}: {error}")
+        else:
+            decoded[path] = result
+
+    ordered = [p for p in paths if p in decoded]
+    if not ordered:
+        return []
+    hashes = dhash(np.stack([decoded[p][0] for p in ordered]))
+    return [(p, int(h), decoded[p][1]) for p, h in zip(ordered, hashes)]
+
+
+def _decode_serial(paths: list):
+    for path in paths:
+        try:
+            yield path, hash_pixels(path), None
+        except Exception as e:
+            yield path, None, e
+
+
+def _probe_masks(width: int, radius: int) -> np.ndarray:
+    """段内所有不超过 radius 位的翻转掩码（含 0）"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks += [sum(1 << b for b in bits) for bits in combinations(range(width), r)]
+    return np.array(masks, dtype=np.uint64)
+
+
+def _candidate_pairs(values: np.ndarray, max_distance: int):
+    """
+    多索引哈希：按段产出候选对 (i, j)，i < j
+
+    64 位分为 BANDS 段；汉明距离不超过 d 时，至少有一段内的距离不超过 d // BANDS，
+    因此只需在每段中查找距离不超过该半径的键（排序后二分查找）。
+    """
+    width = HASH_BITS // BANDS
+    masks = _probe_masks(width, max_distance // BANDS)
+    count = len(values)
+    for band in range(BANDS):
+        keys = (values >> np.uint64(band * width)) & np.uint64((1 << width) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        for begin in range(0, count, PROBE_CHUNK):
+            sources = np.arange(begin, min(count, begin + PROBE_CHUNK))
+            for mask in masks:
+                probe = keys[sources] ^ mask
+                lo = np.searchsorted(sorted_keys, probe, 'left')
+                hits = np.searchsorted(sorted_keys, probe, 'right') - lo
+                total = int(hits.sum())
+                if total == 0:
+                    continue
+                # 展开每个来源命中的区间 [lo, lo + hits)
+                offsets = np.arange(total) - np.repeat(np.cumsum(hits) - hits, hits)
+                first = np.repeat(sources, hits)
+                second = order[np.repeat(lo, hits) + offsets]
+                keep = first < second
+                yield first[keep], second[keep]
+
+
+def group_similar(hashes, max_distance: int = DEFAULT_MAX_DISTANCE) -> list:
+    """
+    把汉明距离不超过 max_distance 的哈希归为一组（相似关系按传递闭包合并）
+
+    Args:
+        hashes: 哈希序列
+        max_distance: 汉明距离阈值
+
+    Returns:
+        [[下标, ...], ...]，只包含两个以上成员的组，组内与组间都按下标排序
+    """
+    # 相同的哈希先合并，只在不同的哈希之间查找（避免纯色图等大量相同哈希挤在一起）
+    values, inverse = np.unique(np.asarray(hashes, dtype=np.uint64), return_inverse=True)
+    parent = list(range(len(values)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for first, second in _candidate_pairs(values, max_distance):
+        diff = np.bitwise_xor(values[first], values[second])
+        distance = np.unpackbits(diff.view(np.uint8)).reshape(len(diff), HASH_BITS).sum(axis=1)
+        close = distance <= max_distance
+        for i, j in zip(first[close].tolist(), second[close].tolist()):
+            a, b = find(i), find(j)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+    groups = {}
+    for i, value_index in enumerate(inverse.ravel().tolist()):
+        groups.setdefault(find(value_index), []).append(i)
+    return sorted((g for g in groups.values() if len(g) > 1), key=lambda g: g[0])
+
+
+def find_similar(paths: list, max_distance: int = DEFAULT_MAX_DISTANCE,
+                 max_workers: int = 1) -> list:
+    """
+    找出相似图片组
+
+    每组按像素数（相同时按文件大小）从大到小排列，第一张视为建议保留的图片。
+
+    Returns:
+        [[(path, (width, height)), ...], ...]
+    """
+    hashed = hash_images(paths, max_workers)
+    groups = group_similar([h for _, h, _ in hashed], max_distance)
+    result = []
+    for group in groups:
+        members = [(hashed[i][0], hashed[i][2]) for i in group]
+        members.sort(key=lambda m: (m[1][0] * m[1][1], _file_size(m[0])), reverse=True)
+        result.append(members)
+    return result
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -6,10 +6,8 @@
 - 批量处理
 """
 import os
-import io
 import logging
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QSlider, QFrame, QFileDialog, QMessageBox, QProgressBar,
@@ -21,7 +19,10 @@ from PySide6.QtGui import QFont, QColor
 
 from ui.workspace import BaseWorkspace, UploadArea
 from ui.image_preview import DualPreviewWidget
+from ui.duplicate_scanner import DuplicateScanner
 from core.config import config
+from tools.image.watermarker import watermark_file
+from tools.image.dedup import output_name_for
 
 
 class WatermarkWorker(QThread):
@@ -30,11 +31,13 @@ class WatermarkWorker(QThread):
     file_processed = Signal(str, bytes, dict, str)  # file_path, data, info, output_name
     finished = Signal(list)
     
-    def __init__(self, files: list, watermark_config: dict, output_dir: str = None):
+    def __init__(self, files: list, watermark_config: dict, output_dir: str = None,
+                 budget_mp: float = None):
         super().__init__()
         self.files = files
         self.config = watermark_config
         self.output_dir = output_dir
+        self.budget_mp = budget_mp
         self.save_files = output_dir is not None
     
     def run(self):
@@ -67,131 +70,8 @@ class WatermarkWorker(QThread):
     
     def add_watermark(self, file_path: str) -> dict:
         """添加水印"""
-        ext = Path(file_path).suffix.lower()
-        output_name = Path(file_path).stem + "_watermarked" + ext
-        output_buffer = io.BytesIO()
-        
-        with Image.open(file_path) as img:
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-            
-            watermark_layer = Image.new('RGBA', img.size, (0, 0, 0, 0))
-            draw = ImageDraw.Draw(watermark_layer)
-            
-            if self.config['type'] == 'text':
-                self.add_text_watermark(draw, img.size)
-            else:
-                self.add_image_watermark(watermark_layer, img.size)
-            
-            result = Image.alpha_composite(img, watermark_layer)
-            
-            # 保存
-            if ext in ['.jpg', '.jpeg']:
-                result = result.convert('RGB')
-                result.save(output_buffer, 'JPEG', quality=95)
-            elif ext == '.png':
-                result.save(output_buffer, 'PNG')
-            else:
-                result = result.convert('RGB')
-                result.save(output_buffer, 'JPEG', quality=95)
-                output_name = Path(file_path).stem + "_watermarked.jpg"
-        
-        data = output_buffer.getvalue()
-        
-        # 如果需要保存
-        output_path = None
-        if self.save_files and self.output_dir:
-            output_path = os.path.join(self.output_dir, output_name)
-            with open(output_path, 'wb') as f:
-                f.write(data)
-        
-        return {
-            "file": file_path,
-            "output": output_path,
-            "output_name": output_name,
-            "success": True,
-            "data": data
-        }
-    
-    def add_text_watermark(self, draw: ImageDraw, img_size: tuple):
-        """添加文字水印"""
-        text = self.config.get('text', 'Watermark')
-        opacity = int(self.config.get('opacity', 50) * 2.55)
-        font_size = self.config.get('font_size', 48)  # 默认更大的字体
-        color = self.config.get('color', (255, 255, 255))
-        position = self.config.get('position', 'center')
-        
-        # 尝试使用支持中文的字体
-        font = None
-        # Windows 中文字体列表
-        chinese_fonts = [
-            "C:/Windows/Fonts/msyh.ttc",      # 微软雅黑
-            "C:/Windows/Fonts/simhei.ttf",    # 黑体
-            "C:/Windows/Fonts/simsun.ttc",    # 宋体
-            "C:/Windows/Fonts/simkai.ttf",    # 楷体
-            "msyh.ttc",
-            "simhei.ttf",
-            "arial.ttf",
-        ]
-        
-        for font_path in chinese_fonts:
-            try:
-                font = ImageFont.truetype(font_path, font_size)
-                break
-            except:
-                continue
-        
-        if font is None:
-            font = ImageFont.load_default()
-        
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        positions = {
-            'top-left': (20, 20),
-            'top-right': (img_size[0] - text_width - 20, 20),
-            'bottom-left': (20, img_size[1] - text_height - 20),
-            'bottom-right': (img_size[0] - text_width - 20, img_size[1] - text_height - 20),
-            'center': ((img_size[0] - text_width) // 2, (img_size[1] - text_height) // 2)
-        }
-        
-        x, y = positions.get(position, positions['center'])
-        draw.text((x, y), text, font=font, fill=(*color, opacity))
-    
-    def add_image_watermark(self, layer: Image, img_size: tuple):
-        """添加图片水印"""
-        watermark_path = self.config.get('image_path')
-        if not watermark_path or not os.path.exists(watermark_path):
-            return
-        
-        opacity = self.config.get('opacity', 50) / 100
-        scale = self.config.get('scale', 20) / 100
-        position = self.config.get('position', 'center')
-        
-        with Image.open(watermark_path) as watermark:
-            if watermark.mode != 'RGBA':
-                watermark = watermark.convert('RGBA')
-            
-            new_width = int(img_size[0] * scale)
-            ratio = new_width / watermark.width
-            new_height = int(watermark.height * ratio)
-            watermark = watermark.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            alpha = watermark.split()[3]
-            alpha = alpha.point(lambda p: int(p * opacity))
-            watermark.putalpha(alpha)
-            
-            positions = {
-                'top-left': (20, 20),
-                'top-right': (img_size[0] - new_width - 20, 20),
-                'bottom-left': (20, img_size[1] - new_height - 20),
-                'bottom-right': (img_size[0] - new_width - 20, img_size[1] - new_height - 20),
-                'center': ((img_size[0] - new_width) // 2, (img_size[1] - new_height) // 2)
-            }
-            
-            x, y = positions.get(position, positions['center'])
-            layer.paste(watermark, (x, y), watermark)
+        output_dir = self.output_dir if self.save_files else None
+        return watermark_file(file_path, self.config, output_dir, self.budget_mp)
 
 
 class ImageWatermarkPage(BaseWorkspace):
@@ -204,6 +84,9 @@ class ImageWatermarkPage(BaseWorkspace):
         self.processed_results = {}
         self.watermark_color = (255, 255, 255)
         self.watermark_image_path = None
+        # 字节相同的输入只处理一次
+        self.duplicate_scanner = DuplicateScanner(self)
+        self.duplicate_scanner.duplicates_found.connect(self.on_duplicates_found)
         self.setup_watermark_ui()
     
     def setup_watermark_ui(self):
@@ -396,11 +279,10 @@ class ImageWatermarkPage(BaseWorkspace):
     
     def on_files_added(self, files: list):
         """文件添加"""
-        for file_path in files:
-            if file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                if file_path not in self.files:
-                    self.files.append(file_path)
-                    self.files_list.addItem(f"📷 {Path(file_path).name}")
+        valid = [f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))]
+        for file_path in self.duplicate_scanner.add(valid):
+            self.files.append(file_path)
+            self.files_list.addItem(f"📷 {Path(file_path).name}")
         
         self.count_label.setText(str(len(self.files)))
         
@@ -409,6 +291,24 @@ class ImageWatermarkPage(BaseWorkspace):
             self.preview_widget.set_original(self.files[0])
             self.current_file_index = 0
     
+    def on_duplicates_found(self, found: dict):
+        """标记与已添加文件内容相同的文件，已有结果的直接复用"""
+        for file_path, original in found.items():
+            item = self.files_list.item(self.files.index(file_path))
+            item.setText(f"{item.text()} · 与 {Path(original).name} 相同")
+            item.setToolTip(f"{file_path}\n内容与 {original} 相同，批量处理时复用其结果")
+            if original in self.processed_results:
+                self.share_result(original, file_path)
+        logging.info(f"发现 {len(found)} 个重复文件，批量添加水印时将跳过")
+    
+    def share_result(self, original: str, file_path: str):
+        """把原文件的处理结果复制给内容相同的文件"""
+        result = self.processed_results[original]
+        self.processed_results[file_path] = {
+            "data": result["data"],
+            "output_name": output_name_for(file_path, original, result["output_name"])
+        }
+    
     def on_file_clicked(self, item):
         """文件点击"""
         row = self.files_list.currentRow()
@@ -427,6 +327,7 @@ class ImageWatermarkPage(BaseWorkspace):
     
     def clear_files(self):
         """清空文件"""
+        self.duplicate_scanner.clear()
         self.files.clear()
         self.files_list.clear()
         self.count_label.setText("0")
@@ -484,7 +385,9 @@ class ImageWatermarkPage(BaseWorkspace):
         self.preview_btn.setEnabled(False)
         self.preview_btn.setText("处理中...")
         
-        self.worker = WatermarkWorker([file_path], watermark_config, None)
+        self.worker = WatermarkWorker(
+            [file_path], watermark_config, None, config.get("large_image_budget_mp", 50)
+        )
         self.worker.file_processed.connect(self.on_preview_ready)
         self.worker.finished.connect(lambda: self.preview_btn.setEnabled(True))
         self.worker.finished.connect(lambda: self.preview_btn.setText("👁️ 预览效果"))
@@ -509,11 +412,17 @@ class ImageWatermarkPage(BaseWorkspace):
             QMessageBox.warning(self, "提示", "请先选择水印图片")
             return
         
+        files = self.duplicate_scanner.unique(self.files)
+        if len(files) < len(self.files):
+            logging.info(f"跳过 {len(self.files) - len(files)} 个重复文件，复用相同内容的处理结果")
+        
         self.start_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         
-        self.worker = WatermarkWorker(self.files, watermark_config, None)
+        self.worker = WatermarkWorker(
+            files, watermark_config, None, config.get("large_image_budget_mp", 50)
+        )
         self.worker.progress.connect(self.on_progress)
         self.worker.file_processed.connect(self.on_file_processed)
         self.worker.finished.connect(self.on_finished)
@@ -531,8 +440,12 @@ class ImageWatermarkPage(BaseWorkspace):
             "data": data,
             "output_name": output_name
         }
+        for copy_path in self.duplicate_scanner.copies_of(file_path):
+            self.share_result(file_path, copy_path)
         
-        if self.files.index(file_path) == self.current_file_index:
+        current = self.files[self.current_file_index]
+        if current == file_path or self.duplicate_scanner.original_of(current) == file_path:
+            output_name = self.processed_results[current]["output_name"]
             self.preview_widget.set_result(data, info, output_name, show_size_compare=False)
     
     def on_finished(self, results: list):
@@ -541,10 +454,14 @@ class ImageWatermarkPage(BaseWorkspace):
         self.progress_bar.setVisible(False)
         
         success_count = sum(1 for r in results if r.get("success"))
-        QMessageBox.information(
-            self, "完成", 
-            f"水印添加完成!\n\n✅ 成功: {success_count}/{len(results)}\n\n请点击「批量保存」或在预览中单独保存"
-        )
+        copies = sum(len(self.duplicate_scanner.copies_of(r["file"]))
+                     for r in results if r.get("success"))
+        
+        msg = f"水印添加完成!\n\n✅ 成功: {success_count}/{len(results)}\n"
+        if copies:
+            msg += f"🔁 重复文件: {copies} 个（已复用结果）\n"
+        msg += "\n请点击「批量保存」或在预览中单独保存"
+        QMessageBox.information(self, "完成", msg)
         logging.info(f"水印添加完成: 成功 {success_count}/{len(results)}")
     
     def on_file_saved(self, save_path):
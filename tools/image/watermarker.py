@@ -0,0 +1,184 @@
+"""
+图片水印引擎
+- 不依赖 Qt，可在子进程 / 命令行中直接调用
+- watermark_file: 单文件加水印任务（可被进程池调度）
+
+水印配置（dict）:
+    type: 'text' 或 'image'
+    opacity: 不透明度 0-100
+    position: top-left / top-right / bottom-left / bottom-right / center
+    text, font_size, color: 文字水印
+    image_path, scale: 图片水印（scale 为占原图宽度的百分比）
+
+水印先渲染为只有水印大小的图层，再合成到原图对应区域，不创建全尺寸图层。
+像素数超过预算的图片不整体转为 RGBA，只转换水印覆盖的区域。
+"""
+import os
+import io
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFont
+
+from tools.image.large import is_large, composite_region
+from tools.image.decoded_cache import open_image
+
+
+POSITIONS = ('top-left', 'top-right', 'bottom-left', 'bottom-right', 'center')
+
+
+def watermark_file(file_path: str, watermark_config: dict, output_dir: str = None,
+                   budget_mp: float = None) -> dict:
+    """
+    给单个图片添加水印
+    
+    Args:
+        file_path: 图片路径
+        watermark_config: 水印配置
+        output_dir: 输出目录，为 None 时只返回数据不写文件
+        budget_mp: 像素预算（百万像素），超过时走有界内存路径
+    
+    Returns:
+        结果字典（含加水印后的数据）
+    """
+    ext = Path(file_path).suffix.lower()
+    output_name = Path(file_path).stem + "_watermarked" + ext
+    output_buffer = io.BytesIO()
+    
+    with open_image(file_path) as img:
+        if not is_large(img.size, budget_mp):
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+        elif img.mode not in ('RGB', 'RGBA'):
+            # 超大图片保持 RGB，避免再占用一份全尺寸 RGBA 缓冲区
+            has_alpha = img.mode in ('LA', 'PA') or 'transparency' in img.info
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+        
+        if watermark_config['type'] == 'text':
+            stamp = render_text_watermark(img.size, watermark_config)
+        else:
+            stamp = render_image_watermark(img.size, watermark_config)
+        
+        if stamp is not None:
+            composite_region(img, *stamp)
+        
+        # 保存（已是 RGB 时不再 convert，convert 总会复制一份整图）
+        if ext != '.png' and img.mode != 'RGB':
+            img = img.convert('RGB')
+        if ext in ['.jpg', '.jpeg']:
+            img.save(output_buffer, 'JPEG', quality=95)
+        elif ext == '.png':
+            img.save(output_buffer, 'PNG')
+        else:
+            img.save(output_buffer, 'JPEG', quality=95)
+            output_name = Path(file_path).stem + "_watermarked.jpg"
+    
+    data = output_buffer.getvalue()
+    
+    # 如果需要保存
+    output_path = None
+    if output_dir:
+        output_path = os.path.join(output_dir, output_name)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    
+    return {
+        "file": file_path,
+        "output": output_path,
+        "output_name": output_name,
+        "success": True,
+        "data": data
+    }
+
+
+def place(item_size: tuple, img_size: tuple, position: str) -> tuple:
+    """计算水印左上角坐标（距边缘 20 像素）"""
+    width, height = item_size
+    positions = {
+        'top-left': (20, 20),
+        'top-right': (img_size[0] - width - 20, 20),
+        'bottom-left': (20, img_size[1] - height - 20),
+        'bottom-right': (img_size[0] - width - 20, img_size[1] - height - 20),
+        'center': ((img_size[0] - width) // 2, (img_size[1] - height) // 2)
+    }
+    return positions.get(position, positions['center'])
+
+
+def load_font(font_size: int):
+    """加载字体，优先使用支持中文的字体"""
+    # Windows 中文字体列表
+    chinese_fonts = [
+        "C:/Windows/Fonts/msyh.ttc",      # 微软雅黑
+        "C:/Windows/Fonts/simhei.ttf",    # 黑体
+        "C:/Windows/Fonts/simsun.ttc",    # 宋体
+        "C:/Windows/Fonts/simkai.ttf",    # 楷体
+        "msyh.ttc",
+        "simhei.ttf",
+        "arial.ttf",
+    ]
+    
+    for font_path in chinese_fonts:
+        try:
+            return ImageFont.truetype(font_path, font_size)
+        except:
+            continue
+    
+    return ImageFont.load_default()
+
+
+def render_text_watermark(img_size: tuple, watermark_config: dict):
+    """
+    渲染文字水印
+    
+    Returns:
+        (水印图层, 左上角坐标)
+    """
+    text = watermark_config.get('text', 'Watermark')
+    opacity = int(watermark_config.get('opacity', 50) * 2.55)
+    font_size = watermark_config.get('font_size', 48)  # 默认更大的字体
+    color = tuple(watermark_config.get('color', (255, 255, 255)))
+    position = watermark_config.get('position', 'center')
+    
+    font = load_font(font_size)
+    
+    bbox = ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    x, y = place((text_width, text_height), img_size, position)
+    
+    # 图层只覆盖文字的实际墨迹范围
+    layer = Image.new('RGBA', (max(1, text_width), max(1, text_height)), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).text((-bbox[0], -bbox[1]), text, font=font, fill=(*color, opacity))
+    return layer, (x + bbox[0], y + bbox[1])
+
+
+def render_image_watermark(img_size: tuple, watermark_config: dict):
+    """
+    渲染图片水印
+    
+    Returns:
+        (水印图层, 左上角坐标)，水印图片不存在时返回 None
+    """
+    watermark_path = watermark_config.get('image_path')
+    if not watermark_path or not os.path.exists(watermark_path):
+        return None
+    
+    opacity = watermark_config.get('opacity', 50) / 100
+    scale = watermark_config.get('scale', 20) / 100
+    position = watermark_config.get('position', 'center')
+    
+    with Image.open(watermark_path) as watermark:
+        if watermark.mode != 'RGBA':
+            watermark = watermark.convert('RGBA')
+        
+        new_width = int(img_size[0] * scale)
+        ratio = new_width / watermark.width
+        new_height = int(watermark.height * ratio)
+        watermark = watermark.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        
+        alpha = watermark.split()[3]
+        alpha = alpha.point(lambda p: int(p * opacity))
+        watermark.putalpha(alpha)
+        
+        layer = Image.new('RGBA', watermark.size, (0, 0, 0, 0))
+        layer.paste(watermark, (0, 0), watermark)
+    
+    return layer, place((new_width, new_height), img_size, position)
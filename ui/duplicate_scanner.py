@@ -0,0 +1,87 @@
+"""
+批量页面的输入去重
+- 添加文件时立即显示，内容哈希在后台线程中计算，不阻塞界面
+- 发现与已添加文件字节相同的文件后发出信号，由页面标记并跳过
+- 同一时间只运行一个哈希线程，按添加顺序依次处理
+"""
+from PySide6.QtCore import QObject, QThread, Signal
+
+from tools.image.dedup import ContentIndex, hash_files
+
+
+class DigestWorker(QThread):
+    """后台计算文件内容哈希"""
+    
+    hashed = Signal(int, list)  # 批次编号, [(path, digest)]
+    
+    def __init__(self, generation: int, paths: list):
+        super().__init__()
+        self.generation = generation
+        self.paths = paths
+    
+    def run(self):
+        self.hashed.emit(self.generation, list(hash_files(self.paths)))
+
+
+class DuplicateScanner(QObject):
+    """内容去重索引 + 后台哈希"""
+    
+    duplicates_found = Signal(dict)  # {重复文件: 首个内容相同的文件}
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.index = ContentIndex()
+        self.generation = 0
+        self.worker = None
+        self.pending = []
+    
+    def add(self, paths: list) -> list:
+        """登记新文件，返回新接受的路径（同一路径重复添加的会被忽略）"""
+        added, to_hash = self.index.add(paths)
+        if to_hash:
+            self.pending.extend(to_hash)
+            self._start_next()
+        return added
+    
+    def _start_next(self):
+        if not self.pending or (self.worker is not None and self.worker.isRunning()):
+            return
+        paths, self.pending = self.pending, []
+        self.worker = DigestWorker(self.generation, paths)
+        self.worker.hashed.connect(self.on_hashed)
+        self.worker.finished.connect(self._start_next)
+        self.worker.start()
+    
+    def on_hashed(self, generation: int, results: list):
+        if generation != self.generation:
+            # 期间已清空文件列表
+            return
+        found = {}
+        for path, digest in results:
+            original = self.index.resolve(path, digest)
+            if original is not None:
+                found[path] = original
+        if found:
+            self.duplicates_found.emit(found)
+    
+    def remove(self, paths: list):
+        """从索引中移除文件"""
+        self.index.remove(paths)
+    
+    def unique(self, paths: list) -> list:
+        """去掉重复文件后的路径列表"""
+        return self.index.unique(paths)
+    
+    def copies_of(self, file_path: str) -> list:
+        """与该文件内容相同的其余文件"""
+        return self.index.copies.get(file_path, [])
+    
+    def original_of(self, file_path: str) -> str:
+        """重复文件对应的首个文件，不是重复文件时返回 None"""
+        return self.index.duplicates.get(file_path)
+    
+    def clear(self):
+        """清空索引，丢弃进行中的哈希结果"""
+        self.generation += 1
+        self.pending.clear()
+        self.index.clear()
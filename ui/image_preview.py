@@ -198,6 +198,11 @@ class ImagePreviewWidget(QFrame):
             self.size_label.setText("")
             self.info_label.setText("")
     
+    def viewport_size(self) -> QSize:
+        """图片显示区域的可用尺寸（按 1:1 显示时能容纳的像素）"""
+        container_size = self.image_container.size()
+        return QSize(max(64, container_size.width() - 20), max(64, container_size.height() - 20))
+    
     def set_info(self, info: dict):
         """设置图片信息"""
         self._image_info = info
@@ -331,6 +336,32 @@ class DualPreviewWidget(QWidget):
             """)
             self.compare_label.setVisible(True)
     
+    def viewport_size(self) -> QSize:
+        """处理结果预览区的可用尺寸"""
+        return self.result_preview.viewport_size()
+    
+    def set_live_result(self, data: bytes, info: dict):
+        """显示实时预览（只含可见区域），完整结果到达前不可保存"""
+        self._processed_data = None
+        self.save_btn.setEnabled(False)
+        self.result_preview.set_image_from_bytes(data, {
+            "name": f"实时预览 {info['crop_size'][0]}×{info['crop_size'][1]}",
+            "size": info["estimated_size"]
+        })
+        
+        quality = f" · 质量 {info['quality']}" if info.get("quality") is not None else ""
+        self.compare_label.setText(
+            f"⏱ 实时预览（可见区域 1:1）{quality} · 预计 {self._format_size(info['estimated_size'])}"
+        )
+        self.compare_label.setStyleSheet("""
+            color: #fbbf24;
+            font-size: 13px;
+            padding: 8px;
+            background: rgba(251, 191, 36, 0.1);
+            border-radius: 8px;
+        """)
+        self.compare_label.setVisible(True)
+    
     def _on_save_clicked(self):
         """保存按钮点击"""
         if not self._processed_data:
@@ -7,7 +7,7 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QFrame, QLineEdit, QFileDialog, QCheckBox, QSlider,
-    QTabWidget, QSpinBox, QMessageBox, QScrollArea, QGroupBox
+    QTabWidget, QSpinBox, QDoubleSpinBox, QMessageBox, QScrollArea, QGroupBox
 )
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
@@ -15,6 +15,9 @@ import logging
 
 from core.config import config
 from ui.log_viewer import LogViewer
+from tools.image.result_cache import ResultCache, get_cache_dir
+from tools.image.decoded_cache import decoded_images
+from tools.image.large import budget_pixels
 
 
 class SettingsPage(QWidget):
@@ -142,6 +145,68 @@ class SettingsPage(QWidget):
         
         layout.addWidget(output_group)
         
+        # 图片处理设置
+        image_group = QGroupBox("🖼️ 图片处理")
+        image_layout = QVBoxLayout(image_group)
+        image_layout.setSpacing(12)
+        
+        ssim_row = QHBoxLayout()
+        ssim_row.addWidget(QLabel("视觉无损 SSIM 阈值:"))
+        ssim_row.addStretch()
+        
+        self.ssim_spin = QDoubleSpinBox()
+        self.ssim_spin.setRange(0.900, 0.999)
+        self.ssim_spin.setDecimals(3)
+        self.ssim_spin.setSingleStep(0.001)
+        self.ssim_spin.setFixedWidth(100)
+        ssim_row.addWidget(self.ssim_spin)
+        image_layout.addLayout(ssim_row)
+        
+        ssim_hint = QLabel("视觉无损模式会选择评分不低于该阈值的最低质量，越高越接近原图")
+        ssim_hint.setStyleSheet("color: #64748b; font-size: 11px;")
+        ssim_hint.setWordWrap(True)
+        image_layout.addWidget(ssim_hint)
+        
+        self.cache_check = QCheckBox("启用压缩结果缓存（重复压缩同一图片时直接读取）")
+        self.cache_check.setStyleSheet("color: #cbd5e1; font-size: 13px;")
+        image_layout.addWidget(self.cache_check)
+        
+        cache_row = QHBoxLayout()
+        cache_row.addWidget(QLabel("缓存上限:"))
+        cache_row.addStretch()
+        
+        self.cache_size_spin = QSpinBox()
+        self.cache_size_spin.setRange(64, 100 * 1024)
+        self.cache_size_spin.setSingleStep(256)
+        self.cache_size_spin.setSuffix(" MB")
+        self.cache_size_spin.setFixedWidth(100)
+        cache_row.addWidget(self.cache_size_spin)
+        
+        clear_cache_btn = QPushButton("🗑 清空缓存")
+        clear_cache_btn.setObjectName("secondary_btn")
+        clear_cache_btn.clicked.connect(self.clear_compress_cache)
+        cache_row.addWidget(clear_cache_btn)
+        image_layout.addLayout(cache_row)
+        
+        budget_row = QHBoxLayout()
+        budget_row.addWidget(QLabel("大图像素预算:"))
+        budget_row.addStretch()
+        
+        self.budget_spin = QSpinBox()
+        self.budget_spin.setRange(10, 2000)
+        self.budget_spin.setSingleStep(10)
+        self.budget_spin.setSuffix(" MP")
+        self.budget_spin.setFixedWidth(100)
+        budget_row.addWidget(self.budget_spin)
+        image_layout.addLayout(budget_row)
+        
+        budget_hint = QLabel("超过该像素数的图片按区域 / 条带处理，并在缩小的代理图上搜索质量，避免内存占用过高")
+        budget_hint.setStyleSheet("color: #64748b; font-size: 11px;")
+        budget_hint.setWordWrap(True)
+        image_layout.addWidget(budget_hint)
+        
+        layout.addWidget(image_group)
+        
         layout.addStretch()
         return widget
     
@@ -194,6 +259,12 @@ class SettingsPage(QWidget):
         self.output_path_edit.setText("")
         self.auto_save_check.setChecked(False)
     
+    def clear_compress_cache(self):
+        """清空压缩结果缓存"""
+        ResultCache(get_cache_dir()).clear()
+        QMessageBox.information(self, "成功", "压缩缓存已清空!")
+        logging.info("压缩结果缓存已清空")
+    
     def on_animation_toggle(self, state):
         """动画开关切换"""
         self.duration_spin.setEnabled(state == Qt.CheckState.Checked.value)
@@ -202,6 +273,10 @@ class SettingsPage(QWidget):
         """加载设置"""
         self.output_path_edit.setText(config.get("output_directory", ""))
         self.auto_save_check.setChecked(config.get("auto_save_to_default", False))
+        self.ssim_spin.setValue(config.get("visually_lossless_ssim", 0.99))
+        self.cache_check.setChecked(config.get("compress_cache_enabled", True))
+        self.cache_size_spin.setValue(config.get("compress_cache_max_mb", 1024))
+        self.budget_spin.setValue(config.get("large_image_budget_mp", 50))
         
         self.animation_check.setChecked(config.get("animation_enabled", True))
         self.duration_spin.setValue(config.get("animation_duration", 300))
@@ -211,6 +286,11 @@ class SettingsPage(QWidget):
         """保存设置"""
         config.set("output_directory", self.output_path_edit.text())
         config.set("auto_save_to_default", self.auto_save_check.isChecked())
+        config.set("visually_lossless_ssim", round(self.ssim_spin.value(), 3))
+        config.set("compress_cache_enabled", self.cache_check.isChecked())
+        config.set("compress_cache_max_mb", self.cache_size_spin.value())
+        config.set("large_image_budget_mp", self.budget_spin.value())
+        decoded_images.max_pixels = budget_pixels(self.budget_spin.value())
         
         config.set("animation_enabled", self.animation_check.isChecked())
         config.set("animation_duration", self.duration_spin.value())
@@ -0,0 +1,91 @@
+"""
+相似图片对话框
+- 按组列出感知哈希相近的图片（缩放副本、重新保存的 JPEG 等）
+- 每组默认保留分辨率最高的一张，其余勾选为待移除
+- 确认后由页面把勾选的文件从待处理列表中移除
+"""
+import os
+from pathlib import Path
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTreeWidget, QTreeWidgetItem
+)
+from PySide6.QtCore import Qt
+
+
+class SimilarImagesDialog(QDialog):
+    """相似图片分组结果"""
+    
+    def __init__(self, groups: list, parent=None):
+        """
+        Args:
+            groups: [[(path, (width, height)), ...], ...]，每组第一张为建议保留的图片
+        """
+        super().__init__(parent)
+        self.setWindowTitle("相似图片")
+        self.setModal(True)
+        self.resize(560, 420)
+        self.setStyleSheet("""
+            QDialog { background: #0f172a; }
+            QLabel { color: #e2e8f0; }
+            QTreeWidget {
+                background: #1e293b;
+                color: #e2e8f0;
+                border: 1px solid #334155;
+                border-radius: 6px;
+            }
+        """)
+        
+        layout = QVBoxLayout(self)
+        
+        count = sum(len(g) for g in groups)
+        summary = QLabel(
+            f"找到 {len(groups)} 组相似图片（共 {count} 张），"
+            f"每组默认保留分辨率最高的一张，勾选的图片将从列表中移除"
+        )
+        summary.setWordWrap(True)
+        layout.addWidget(summary)
+        
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["文件", "尺寸", "大小"])
+        self.tree.setColumnWidth(0, 320)
+        for index, group in enumerate(groups, 1):
+            group_item = QTreeWidgetItem([f"第 {index} 组 · {len(group)} 张", "", ""])
+            for position, (path, size) in enumerate(group):
+                try:
+                    file_size = f"{os.path.getsize(path) / 1024:.1f} KB"
+                except OSError:
+                    file_size = "-"
+                child = QTreeWidgetItem([Path(path).name, f"{size[0]}×{size[1]}", file_size])
+                child.setToolTip(0, path)
+                child.setData(0, Qt.ItemDataRole.UserRole, path)
+                child.setCheckState(
+                    0, Qt.CheckState.Unchecked if position == 0 else Qt.CheckState.Checked
+                )
+                group_item.addChild(child)
+            self.tree.addTopLevelItem(group_item)
+        self.tree.expandAll()
+        layout.addWidget(self.tree, 1)
+        
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        cancel_btn = QPushButton("取消")
+        cancel_btn.setObjectName("secondary_btn")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(cancel_btn)
+        remove_btn = QPushButton("🗑️ 移除勾选的图片")
+        remove_btn.setObjectName("primary_btn")
+        remove_btn.clicked.connect(self.accept)
+        buttons.addWidget(remove_btn)
+        layout.addLayout(buttons)
+    
+    def selected_paths(self) -> list:
+        """勾选为待移除的文件"""
+        paths = []
+        for i in range(self.tree.topLevelItemCount()):
+            group_item = self.tree.topLevelItem(i)
+            for j in range(group_item.childCount()):
+                child = group_item.child(j)
+                if child.checkState(0) == Qt.CheckState.Checked:
+                    paths.append(child.data(0, Qt.ItemDataRole.UserRole))
+        return paths